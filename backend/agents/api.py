@@ -2,68 +2,203 @@
 AI Agent System API endpoints
 """
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from typing import Dict, Any
-from pydantic import BaseModel
-import json
+from fastapi.responses import StreamingResponse, Response
+from typing import Dict, Any, Optional
+from functools import lru_cache
+from pydantic import BaseModel, ConfigDict
 import asyncio
+import hashlib
+import logging
+import uuid
+import orjson
 
 from agents.workflow import AgentWorkflow, AgentState
+from agents.stream_broker import agent_stream_broker
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/agents", tags=["agents"])
 
-# Initialize the workflow
-workflow = AgentWorkflow()
+# SSE frame envelope, pre-encoded so each event is a single bytes concat
+SSE_DATA_PREFIX = b"data: "
+SSE_FRAME_SUFFIX = b"\n\n"
+
+# Comment frame sent while agents are busy so proxies don't drop idle streams
+SSE_PING_FRAME = b": ping\n\n"
+SSE_PING_INTERVAL = 15.0
+
+# AgentDecision fields copied into /process and /process-with-interactions results
+DECISION_RESULT_FIELDS = {"decision", "reasoning", "metadata"}
+DECISION_SUMMARY_FIELDS = {"decision", "reasoning", "confidence", "metadata"}
+
+AGENT_NAMES = [
+    "orchestrator",
+    "detector",
+    "investigator",
+    "monitor",
+    "judge",
+    "mitigator"
+]
+
+# Static capabilities payload, encoded once at import
+CAPABILITIES_BODY = orjson.dumps({
+    "orchestrator": {
+        "role": "coordination",
+        "capabilities": ["routing", "coordination", "workflow_management"]
+    },
+    "detector": {
+        "role": "threat_detection",
+        "capabilities": ["pattern_analysis", "anomaly_detection", "threat_classification"]
+    },
+    "investigator": {
+        "role": "deep_analysis",
+        "capabilities": ["forensic_analysis", "correlation", "evidence_gathering"]
+    },
+    "monitor": {
+        "role": "system_monitoring",
+        "capabilities": ["real_time_monitoring", "performance_tracking", "alerting"]
+    },
+    "judge": {
+        "role": "decision_making",
+        "capabilities": ["decision_aggregation", "confidence_scoring", "explainability"]
+    },
+    "mitigator": {
+        "role": "threat_response",
+        "capabilities": ["automated_response", "escalation", "remediation"]
+    }
+})
+
+@lru_cache(maxsize=1)
+def get_workflow() -> AgentWorkflow:
+    """Build the agent workflow on first use and reuse it for the process lifetime"""
+    return AgentWorkflow()
+
+
+async def with_keepalive(frames, interval: float = SSE_PING_INTERVAL):
+    """Pass SSE frames through, emitting a ping comment whenever the producer is idle for `interval` seconds"""
+    iterator = frames.__aiter__()
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=interval)
+            if not done:
+                yield SSE_PING_FRAME
+                continue
+            try:
+                frame = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield frame
+    finally:
+        if pending is not None:
+            pending.cancel()
+            # Let the cancelled step finish so the inner generator is no longer running
+            await asyncio.wait({pending})
+        # Close the inner stream now (e.g. to unsubscribe from the broker) instead of leaving it to the GC
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+def get_interactions_summary(result: AgentState) -> Dict[str, Any]:
+    """Build the agent interactions summary for a workflow result once and memoize it on the result"""
+    summary = result.get("_interactions_summary")
+    if summary is None:
+        summary = get_workflow().get_agent_interactions_summary(result)
+        result["_interactions_summary"] = summary
+    return summary
+
+
+def _encode_default(obj: Any) -> Any:
+    """orjson fallback for values it cannot encode natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return str(obj)
+
+
+def json_response(payload: Dict[str, Any]) -> Response:
+    """Encode a handler payload straight to bytes, skipping FastAPI's jsonable_encoder pass"""
+    return Response(
+        orjson.dumps(payload, default=_encode_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS),
+        media_type="application/json"
+    )
+
+
+def log_netflow_payload(source: str, data: Dict[str, Any]):
+    """Debug-log the size of an incoming NetFlow payload and a sample edge"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    nodes = data.get('nodes') or ()
+    edges = data.get('edges') or ()
+    logger.debug("%s received NetFlow data: nodes=%d edges=%d", source, len(nodes), len(edges))
+    if edges:
+        logger.debug("Sample edge: %s", edges[0])
+
+
+# Request/response models are validated once and never reassigned
+API_MODEL_CONFIG = ConfigDict(extra="ignore", validate_assignment=False, frozen=False)
 
 
 class AgentRequest(BaseModel):
     """Request model for agent processing"""
+    model_config = API_MODEL_CONFIG
+
     data: Dict[str, Any]
     context: Dict[str, Any] = {}
 
 
 class AgentResponse(BaseModel):
     """Response model for agent processing"""
+    model_config = API_MODEL_CONFIG
+
     success: bool
     result: Dict[str, Any]
     explanation: str
     confidence: float
-    error: str = None
+    error: Optional[str] = None
+
+
+def request_digest(request: AgentRequest) -> str:
+    """Stable hash of a request's data and context, so a shared run only serves identical requests"""
+    body = orjson.dumps(
+        {"data": request.data, "context": request.context},
+        default=_encode_default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+    )
+    return hashlib.sha256(body).hexdigest()
 
 
 @router.post("/process/stream")
-async def process_with_agents_stream(request: AgentRequest):
+async def process_with_agents_stream(request: AgentRequest, run_id: Optional[str] = None):
     """
     Stream agent processing results in real-time using Server-Sent Events
 
-    This endpoint streams updates as each agent completes its analysis
+    This endpoint streams updates as each agent completes its analysis.
+    Clients passing the same `run_id` and the same request body share a single
+    workflow run, so each update is produced and encoded once regardless of how
+    many are watching. A different body under a known `run_id` starts its own run.
     """
+    if run_id:
+        broker_key = f"{run_id}:{request_digest(request)}"
+    else:
+        run_id = broker_key = uuid.uuid4().hex
+
     async def generate_agent_stream():
         try:
             # Debug: Log the NetFlow data received by agents
-            print("=== AGENT API RECEIVED NETFLOW DATA (STREAMING) ===")
-            print(f"Nodes: {len(request.data.get('nodes', []))}")
-            print(f"Edges: {len(request.data.get('edges', []))}")
-            if request.data.get('edges'):
-                sample_edge = request.data['edges'][0]
-                print(f"Sample Edge: {sample_edge}")
-            print("====================================================")
+            log_netflow_payload("Agent stream", request.data)
 
             # Create a streaming callback workflow
-            async for agent_update in workflow.run_streaming(
+            async for agent_update in get_workflow().run_streaming(
                 input_data=request.data,
                 context=request.context
             ):
                 # Send agent update as SSE
-                yield f"data: {json.dumps(agent_update)}\n\n"
-                await asyncio.sleep(0.01)  # Small delay to ensure delivery
+                yield SSE_DATA_PREFIX + orjson.dumps(agent_update) + SSE_FRAME_SUFFIX
 
         except Exception as e:
-            import traceback
-            error_traceback = traceback.format_exc()
-            print(f"❌ AGENT WORKFLOW STREAMING ERROR: {str(e)}")
-            print(f"❌ TRACEBACK:\n{error_traceback}")
+            logger.exception("Agent workflow streaming error")
 
             error_data = {
                 "type": "error",
@@ -74,15 +209,16 @@ async def process_with_agents_stream(request: AgentRequest):
                     "reasoning": f"Agent system encountered an error: {str(e)}"
                 }
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield SSE_DATA_PREFIX + orjson.dumps(error_data) + SSE_FRAME_SUFFIX
 
     return StreamingResponse(
-        generate_agent_stream(),
+        with_keepalive(agent_stream_broker.stream(broker_key, generate_agent_stream)),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
+            "X-Accel-Buffering": "no",
+            "X-Run-Id": run_id
         }
     )
 
@@ -102,59 +238,51 @@ async def process_with_agents(request: AgentRequest):
     """
     try:
         # Debug: Log the NetFlow data received by agents
-        print("=== AGENT API RECEIVED NETFLOW DATA ===")
-        print(f"Nodes: {len(request.data.get('nodes', []))}")
-        print(f"Edges: {len(request.data.get('edges', []))}")
-        if request.data.get('edges'):
-            sample_edge = request.data['edges'][0]
-            print(f"Sample Edge: {sample_edge}")
-        print("=====================================")
+        log_netflow_payload("Agent API", request.data)
 
         # Run the agent workflow
-        result: AgentState = await workflow.run(
+        result: AgentState = await get_workflow().run(
             input_data=request.data,
             context=request.context
         )
 
         # Generate agent interactions summary with transparency
-        interactions_summary = workflow.get_agent_interactions_summary(result)
+        interactions_summary = get_interactions_summary(result)
 
         # Debug: Log the workflow result and interactions
-        print(f"✅ WORKFLOW COMPLETED")
-        print(f"   Completed agents: {result.get('completed_agents', [])}")
-        print(f"   Current step: {result.get('current_step')}")
-        print(f"   Total interactions: {interactions_summary.get('total_interactions', 0)}")
+        logger.debug(
+            "Workflow completed: agents=%s step=%s interactions=%d",
+            result.get('completed_agents', []),
+            result.get('current_step'),
+            interactions_summary.get('total_interactions', 0)
+        )
 
         # Extract final results
         final_decision = result.get("final_decision")
         if not final_decision:
-            print(f"❌ NO FINAL DECISION FOUND IN WORKFLOW RESULT")
-            print(f"   Available keys: {list(result.keys())}")
+            logger.error("No final decision in workflow result; keys=%s", list(result.keys()))
             raise HTTPException(status_code=500, detail="No final decision reached")
 
-        return {
+        decision_fields = final_decision.model_dump(mode="json", include=DECISION_RESULT_FIELDS)
+
+        return json_response({
             "success": True,
             "result": {
-                "decision": final_decision.decision,
-                "reasoning": final_decision.reasoning,
-                "metadata": final_decision.metadata,
+                **decision_fields,
                 "workflow_state": {
                     "current_step": result.get("current_step"),
                     "completed_agents": result.get("completed_agents", [])
                 }
             },
-            "explanation": final_decision.reasoning,
+            "explanation": decision_fields["reasoning"],
             "confidence": final_decision.confidence,
             # NEW: Detailed agent interactions for transparency
             "agent_interactions": interactions_summary
-        }
+        })
 
     except Exception as e:
-        import traceback
-        error_traceback = traceback.format_exc()
-        print(f"❌ AGENT WORKFLOW ERROR: {str(e)}")
-        print(f"❌ TRACEBACK:\n{error_traceback}")
-        return {
+        logger.exception("Agent workflow error")
+        return json_response({
             "success": False,
             "result": {},
             "explanation": f"Agent workflow error: {str(e)}",
@@ -171,7 +299,7 @@ async def process_with_agents(request: AgentRequest):
                     "reasoning": f"Agent system encountered an error: {str(e)}"
                 }
             }
-        }
+        })
 
 
 @router.post("/process-with-interactions")
@@ -184,34 +312,44 @@ async def process_with_interactions(request: AgentRequest):
     """
     try:
         # Run the agent workflow
-        result: AgentState = await workflow.run(
+        result: AgentState = await get_workflow().run(
             input_data=request.data,
             context=request.context
         )
         
         # Generate agent interactions summary
-        interactions_summary = workflow.get_agent_interactions_summary(result)
+        interactions_summary = get_interactions_summary(result)
         
         # Extract final results
         final_decision = result.get("final_decision")
+        if final_decision:
+            decision_fields = final_decision.model_dump(mode="json", include=DECISION_SUMMARY_FIELDS)
+            decision_result = {
+                "final_decision": decision_fields["decision"],
+                "reasoning": decision_fields["reasoning"],
+                "confidence": decision_fields["confidence"],
+                "metadata": decision_fields["metadata"]
+            }
+        else:
+            decision_result = {
+                "final_decision": "pending",
+                "reasoning": "No final decision yet",
+                "confidence": 0.0,
+                "metadata": {}
+            }
         
-        return {
+        return json_response({
             "success": True,
-            "result": {
-                "final_decision": final_decision.decision if final_decision else "pending",
-                "reasoning": final_decision.reasoning if final_decision else "No final decision yet",
-                "confidence": final_decision.confidence if final_decision else 0.0,
-                "metadata": final_decision.metadata if final_decision else {}
-            },
+            "result": decision_result,
             "agent_interactions": interactions_summary,
             "workflow_state": {
                 "current_step": result.get("current_step"),
                 "completed_agents": result.get("completed_agents", [])
             }
-        }
+        })
         
     except Exception as e:
-        return {
+        return json_response({
             "success": False,
             "result": {},
             "agent_interactions": {
@@ -230,53 +368,21 @@ async def process_with_interactions(request: AgentRequest):
                 "completed_agents": []
             },
             "error": str(e)
-        }
+        })
 
 
 @router.get("/status")
 async def get_agent_status():
     """Get the status of the agent system"""
-    return {
+    return json_response({
         "status": "operational",
-        "agents": [
-            "orchestrator",
-            "detector", 
-            "investigator",
-            "monitor",
-            "judge",
-            "mitigator"
-        ],
-        "workflow_ready": workflow.graph is not None
-    }
+        "agents": AGENT_NAMES,
+        "workflow_ready": get_workflow().graph is not None,
+        "streams": agent_stream_broker.get_status()
+    })
 
 
 @router.get("/capabilities")
 async def get_agent_capabilities():
     """Get capabilities of each agent"""
-    return {
-        "orchestrator": {
-            "role": "coordination",
-            "capabilities": ["routing", "coordination", "workflow_management"]
-        },
-        "detector": {
-            "role": "threat_detection", 
-            "capabilities": ["pattern_analysis", "anomaly_detection", "threat_classification"]
-        },
-        "investigator": {
-            "role": "deep_analysis",
-            "capabilities": ["forensic_analysis", "correlation", "evidence_gathering"]
-        },
-        "monitor": {
-            "role": "system_monitoring",
-            "capabilities": ["real_time_monitoring", "performance_tracking", "alerting"]
-        },
-        "judge": {
-            "role": "decision_making",
-            "capabilities": ["decision_aggregation", "confidence_scoring", "explainability"]
-        },
-        "mitigator": {
-            "role": "threat_response",
-            "capabilities": ["automated_response", "escalation", "remediation"]
-        }
-    }
-    
\ No newline at end of file
+    return Response(CAPABILITIES_BODY, media_type="application/json")
@@ -3,12 +3,15 @@
 Base classes and interfaces for AI agents
 """
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
 from typing import Dict, Any, List, Optional
-from pydantic import BaseModel
-from enum import Enum
+from pydantic import BaseModel, ConfigDict, Field, computed_field
+from datetime import datetime, timezone
+from enum import StrEnum
+import time
 
 
-class AgentRole(str, Enum):
+class AgentRole(StrEnum):
     """Roles in the AI agent system"""
     ORCHESTRATOR = "orchestrator"
     DETECTOR = "detector"
@@ -18,7 +21,7 @@ class AgentRole(str, Enum):
     MITIGATOR = "mitigator"
 
 
-class ThreatLevel(str, Enum):
+class ThreatLevel(StrEnum):
     """Threat severity levels"""
     LOW = "low"
     MEDIUM = "medium"
@@ -26,14 +29,20 @@ class ThreatLevel(str, Enum):
     CRITICAL = "critical"
 
 
+# Shared default for decisions created without metadata; AgentDecision is frozen
+_EMPTY_META: Dict[str, Any] = {}
+
+
 class AgentDecision(BaseModel):
     """Base decision structure for all agents"""
+    model_config = ConfigDict(frozen=True)
+
     agent_id: str
     decision: str
     confidence: float
     reasoning: str
     metadata: Dict[str, Any] = {}
-    timestamp: Optional[str] = None
+    timestamp_ns: int = Field(default_factory=time.time_ns)  # Creation time, formatted on demand
 
     # Enhanced transparency fields
     llm_prompt: Optional[str] = None  # The prompt sent to the LLM
@@ -41,18 +50,26 @@ class AgentDecision(BaseModel):
     intermediate_steps: List[Dict[str, Any]] = []  # Step-by-step reasoning
     processing_time_ms: Optional[float] = None  # How long this agent took
 
+    @computed_field
+    @property
+    def timestamp(self) -> str:
+        """ISO 8601 creation time (UTC)"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9, tz=timezone.utc).isoformat()
+
 
-class AgentInput(BaseModel):
-    """Base input structure for agents"""
+@dataclass(slots=True)
+class AgentInput:
+    """Base input structure for agents (internal, not validated)"""
     data: Dict[str, Any]
-    context: Dict[str, Any] = {}
-    previous_decisions: List[AgentDecision] = []
+    context: Dict[str, Any] = field(default_factory=dict)
+    previous_decisions: List[AgentDecision] = field(default_factory=list)
 
 
-class AgentOutput(BaseModel):
-    """Base output structure for agents"""
+@dataclass(slots=True)
+class AgentOutput:
+    """Base output structure for agents (internal, not validated)"""
     decision: AgentDecision
-    next_agents: List[str] = []
+    next_agents: List[str] = field(default_factory=list)
     should_continue: bool = True
 
 
@@ -83,7 +100,7 @@ class BaseAgent(ABC):
         decision: str, 
         confidence: float, 
         reasoning: str,
-        metadata: Dict[str, Any] = None
+        metadata: Optional[Dict[str, Any]] = None
     ) -> AgentDecision:
         """Create a standardized decision object"""
         return AgentDecision(
@@ -91,5 +108,5 @@ class BaseAgent(ABC):
             decision=decision,
             confidence=confidence,
             reasoning=reasoning,
-            metadata=metadata or {}
+            metadata=metadata if metadata is not None else _EMPTY_META
         )
@@ -2,11 +2,176 @@
 Batch Processor for Progressive Network Data Revelation
 Intelligently chunks processed network data into logical batches for visualization
 """
-import json
+import logging
+import os
 import random
-from typing import Dict, List, Any, Tuple, Optional
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Any, Tuple, Optional, Iterator
 from datetime import datetime
 import math
+import numpy as np
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Batch fields that are filled in per send by the stream and so are left out of the cached encoding
+STREAM_FIELDS = frozenset({'batch_number', 'total_batches', 'elapsed_time', 'type'})
+
+# Integer codes for the node statuses batches are built around; anything else is 0
+STATUS_CODES = {'attacked': 1, 'suspicious': 2}
+
+
+@dataclass
+class NodeColumns:
+    """Struct-of-arrays view of a node list with country/city/status stored as integer codes"""
+    source: List[Dict[str, Any]]
+    country: np.ndarray
+    city: np.ndarray
+    status: np.ndarray
+    country_codes: Dict[str, int]
+    city_names: List[str]
+    rows_by_country: Optional[List[np.ndarray]] = field(default=None, repr=False)
+
+    @classmethod
+    def from_nodes(cls, nodes: List[Dict[str, Any]]) -> "NodeColumns":
+        country_codes: Dict[str, int] = {}
+        city_codes: Dict[str, int] = {}
+        count = len(nodes)
+        return cls(
+            source=nodes,
+            country=np.fromiter(
+                (country_codes.setdefault(n.get('country'), len(country_codes)) for n in nodes),
+                dtype=np.int32, count=count
+            ),
+            city=np.fromiter(
+                (city_codes.setdefault(n.get('city', 'Unknown'), len(city_codes)) for n in nodes),
+                dtype=np.int32, count=count
+            ),
+            status=np.fromiter(
+                (STATUS_CODES.get(n.get('status'), 0) for n in nodes),
+                dtype=np.int8, count=count
+            ),
+            country_codes=country_codes,
+            city_names=list(city_codes)
+        )
+
+    def country_indices(self, country: Optional[str]) -> np.ndarray:
+        """Row indices of nodes in `country` (all rows when no country is given)"""
+        if not country:
+            return np.arange(len(self.source))
+        code = self.country_codes.get(country)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        if self.rows_by_country is None:
+            # Bucket every country's rows in one stable sort, shared by later country queries
+            order = np.argsort(self.country, kind='stable')
+            counts = np.bincount(self.country, minlength=len(self.country_codes))
+            self.rows_by_country = np.split(order, np.cumsum(counts)[:-1])
+        return self.rows_by_country[code]
+
+
+# Repetitive string fields shared through sys.intern so each distinct value is stored once per dataset;
+# node ids are included so edge endpoints share the node's id string
+INTERNED_NODE_FIELDS = ('id', 'country', 'city', 'node_type', 'status')
+INTERNED_EDGE_FIELDS = ('source_id', 'target_id', 'connection_type', 'protocol', 'attack_type')
+
+
+def _intern_fields(records: List[Dict], fields: Tuple[str, ...]):
+    """Replace the string values of `fields` in every record with their interned copy"""
+    intern = sys.intern
+    for record in records:
+        for key in fields:
+            value = record.get(key)
+            if type(value) is str:
+                record[key] = intern(value)
+
+
+@lru_cache(maxsize=32)
+def _load_json(file_path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a processed dataset; cached per (path, mtime) and shared, so callers must not mutate it"""
+    with open(file_path, 'rb') as f:
+        data = orjson.loads(f.read())
+    _intern_fields(data.get('nodes', ()), INTERNED_NODE_FIELDS)
+    _intern_fields(data.get('edges', ()), INTERNED_EDGE_FIELDS)
+    return data
+
+
+@lru_cache(maxsize=32)
+def _node_columns(file_path: str, mtime: float) -> NodeColumns:
+    """Columnar node view of a cached dataset, built once per (path, mtime)"""
+    return NodeColumns.from_nodes(_load_json(file_path, mtime).get('nodes', []))
+
+
+def build_adjacency(edges: List[Dict]) -> Dict[str, List[Tuple[str, str, Dict]]]:
+    """Map each node id to (source_id, target_id, edge) for the edges touching it"""
+    adjacency = defaultdict(list)
+    for edge in edges:
+        source, target = edge.get('source_id'), edge.get('target_id')
+        entry = (source, target, edge)
+        adjacency[source].append(entry)
+        if target != source:
+            adjacency[target].append(entry)
+    return adjacency
+
+
+@lru_cache(maxsize=32)
+def _dataset_adjacency(file_path: str, mtime: float) -> Dict[str, List[Tuple[str, str, Dict]]]:
+    """Full-graph adjacency of a cached dataset, built once per (path, mtime) and shared by every country"""
+    return build_adjacency(_load_json(file_path, mtime).get('edges', []))
+
+
+@lru_cache(maxsize=32)
+def _dataset_countries(file_path: str, mtime: float) -> frozenset:
+    """Countries present in a cached dataset, collected once per (path, mtime)"""
+    countries = set()
+    for node in _load_json(file_path, mtime).get('nodes', ()):
+        country = node.get('country')
+        if country:
+            countries.add(country)
+    return frozenset(countries)
+
+
+def load_dataset(file_path: str) -> Dict[str, Any]:
+    """Load a processed dataset, re-parsing only when the file has changed on disk"""
+    return _load_json(file_path, os.path.getmtime(file_path))
+
+
+def load_dataset_columns(file_path: str) -> NodeColumns:
+    """Columnar node view of a processed dataset (see load_dataset)"""
+    return _node_columns(file_path, os.path.getmtime(file_path))
+
+
+def load_dataset_adjacency(file_path: str) -> Dict[str, List[Tuple[str, str, Dict]]]:
+    """Full-graph adjacency of a processed dataset (see load_dataset)"""
+    return _dataset_adjacency(file_path, os.path.getmtime(file_path))
+
+
+# Datasets above this size are streamed per country instead of parsed whole
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+
+def stream_country_subset(file_path: str, country: str) -> Dict[str, Any]:
+    """
+    Incrementally parse a processed dataset, keeping only one country's nodes
+    and the edges between them, so the full file never resides in memory
+    """
+    import ijson
+
+    with open(file_path, 'rb') as f:
+        nodes = [n for n in ijson.items(f, 'nodes.item', use_float=True) if n.get('country') == country]
+    node_ids = {n['id'] for n in nodes}
+
+    with open(file_path, 'rb') as f:
+        edges = [
+            e for e in ijson.items(f, 'edges.item', use_float=True)
+            if e.get('source_id') in node_ids and e.get('target_id') in node_ids
+        ]
+
+    return {'nodes': nodes, 'edges': edges}
 
 class NetworkBatchProcessor:
     """
@@ -17,69 +182,154 @@ class NetworkBatchProcessor:
         self.batch_size = batch_size
         self.batch_interval = batch_interval
         self.processed_data = None
+        self.node_columns: Optional[NodeColumns] = None
+        # Adjacency of the whole loaded graph and the edge list it was built from
+        self.adjacency: Optional[Dict[str, List[Tuple[str, str, Dict]]]] = None
+        self.adjacency_source: Optional[List[Dict]] = None
+        self.countries: frozenset = frozenset()
         self.batches = []
+        self.pending_batches: Iterator[Dict[str, Any]] = iter(())
+        self.total_batches = 0
+        self.encoded_batches: List[bytes] = []
+        self.batch_timestamp: Optional[str] = None
+        self.compact_batches: Optional[Dict[str, Any]] = None
         self.current_batch_index = 0
         
-    def load_processed_data(self, file_path: str) -> Dict[str, Any]:
-        """Load processed network data from JSON file"""
+    def load_processed_data(self, file_path: str, country_filter: str = None) -> Dict[str, Any]:
+        """
+        Load processed network data from JSON file
+        Large files are streamed down to `country_filter` when one is given
+        """
         try:
-            import os
             if not os.path.exists(file_path):
-                print(f"File not found: {file_path}")
+                logger.warning("File not found: %s", file_path)
                 return {}
                 
-            with open(file_path, 'r') as f:
-                data = json.load(f)
+            if country_filter and os.path.getsize(file_path) > STREAMING_THRESHOLD_BYTES:
+                data = stream_country_subset(file_path, country_filter)
+                self.node_columns = NodeColumns.from_nodes(data['nodes'])
+                self.adjacency = None
+            else:
+                data = load_dataset(file_path)
+                self.node_columns = load_dataset_columns(file_path)
+                self.adjacency = load_dataset_adjacency(file_path)
+            self.adjacency_source = data.get('edges', [])
             self.processed_data = data
-            print(f"Loaded {len(data.get('nodes', []))} nodes and {len(data.get('edges', []))} edges from {file_path}")
+            self.countries = frozenset(c for c in self.node_columns.country_codes if c)
+            logger.info("Loaded %d nodes and %d edges from %s", len(data.get('nodes', ())), len(data.get('edges', ())), file_path)
             return data
         except Exception as e:
-            print(f"Error loading processed data from {file_path}: {e}")
+            logger.error("Error loading processed data from %s: %s", file_path, e)
             return {}
     
     def create_logical_batches(self, country_filter: str = None) -> List[Dict[str, Any]]:
         """
         Create logical batches based on network topology and attack patterns
         Prioritizes showing attack patterns and network relationships
+        Only the prioritized batches are built here; the random batches for the remaining
+        nodes are built on demand (see get_batch) and counted in total_batches
         """
+        self.batches = []
+        self.pending_batches = iter(())
+        self.total_batches = 0
+        self.encoded_batches = []
+        self.compact_batches = None
+        # One creation timestamp shared by every batch of this run (including lazily built ones)
+        self.batch_timestamp = datetime.now().isoformat()
         if not self.processed_data:
             return []
         
-        nodes = self.processed_data.get('nodes', [])
+        all_nodes = self.processed_data.get('nodes', [])
         edges = self.processed_data.get('edges', [])
+        columns = self.node_columns
+        if columns is None or columns.source is not all_nodes:
+            columns = self.node_columns = NodeColumns.from_nodes(all_nodes)
+        
+        # Filter by country and bucket by status and city on the code columns;
+        # node dicts are only gathered for the rows that end up in a bucket
+        rows = columns.country_indices(country_filter)
+        if not rows.size:
+            return []
+        
+        nodes = [all_nodes[i] for i in rows]
+        statuses = columns.status[rows]
+        nodes_by_status = {
+            status: [all_nodes[i] for i in rows[statuses == code]]
+            for status, code in STATUS_CODES.items()
+        }
+        
+        # Cities keep the order in which they first appear
+        cities = columns.city[rows]
+        city_codes, first_seen = np.unique(cities, return_index=True)
+        nodes_by_city = {
+            columns.city_names[city_codes[k]]: [all_nodes[i] for i in rows[cities == city_codes[k]]]
+            for k in np.argsort(first_seen)
+        }
+        
+        # The full-graph adjacency is built once per dataset and shared by every country;
+        # a country only walks its own nodes' neighbourhoods to find its internal edges
+        if self.adjacency is None or self.adjacency_source is not edges:
+            self.adjacency = build_adjacency(edges)
+            self.adjacency_source = edges
+        adjacency = self.adjacency
         
-        # Filter by country if specified
         if country_filter:
-            nodes = [n for n in nodes if n.get('country') == country_filter]
             node_ids = {n['id'] for n in nodes}
-            edges = [e for e in edges if e.get('source_id') in node_ids and e.get('target_id') in node_ids]
-        
-        if not nodes:
-            return []
+            adjacency = build_adjacency([
+                edge
+                for node in nodes
+                for source, target, edge in adjacency.get(node['id'], ())
+                if source == node['id'] and target in node_ids
+            ])
         
         # Strategy 1: Group by attack patterns and network topology
-        batches = self._create_attack_pattern_batches(nodes, edges)
+        batches = self._create_attack_pattern_batches(nodes_by_status, adjacency)
         
         # Strategy 2: If not enough attack patterns, create geographic/type-based batches
         if len(batches) < 3:
-            batches.extend(self._create_geographic_batches(nodes, edges))
+            batches.extend(self._create_geographic_batches(nodes_by_city, adjacency))
         
         # Strategy 3: Fill remaining with random batches
-        remaining_nodes = self._get_remaining_nodes(nodes, batches)
-        if remaining_nodes:
-            batches.extend(self._create_random_batches(remaining_nodes, edges))
+        used_ids = {n['id'] for batch in batches for n in batch['nodes']}
+        remaining_nodes = [n for n in nodes if n['id'] not in used_ids]
         
         self.batches = batches
-        print(f"Created {len(batches)} logical batches for {country_filter or 'all countries'}")
+        self.pending_batches = self._create_random_batches(remaining_nodes, adjacency)
+        self.total_batches = len(batches) + math.ceil(len(remaining_nodes) / self.batch_size)
+        logger.info("Created %d logical batches for %s", self.total_batches, country_filter or 'all countries')
         return batches
     
-    def _create_attack_pattern_batches(self, nodes: List[Dict], edges: List[Dict]) -> List[Dict[str, Any]]:
+    def _incident_edges(self, batch_nodes: List[Dict], adjacency: Dict[str, List[Tuple[str, str, Dict]]], limit: int) -> List[Dict]:
+        """Up to `limit` edges with at least one endpoint in the batch, each listed once"""
+        node_ids = {n['id'] for n in batch_nodes}
+        # An edge inside the batch is taken from its source's side only
+        incident = (
+            edge
+            for node_id in (n['id'] for n in batch_nodes)
+            for source, target, edge in adjacency.get(node_id, ())
+            if source == node_id or source not in node_ids
+        )
+        return list(islice(incident, limit))
+    
+    def _internal_edges(self, batch_nodes: List[Dict], adjacency: Dict[str, List[Tuple[str, str, Dict]]], limit: int) -> List[Dict]:
+        """Up to `limit` edges with both endpoints in the batch, each listed once"""
+        node_ids = {n['id'] for n in batch_nodes}
+        # Taken from the source's side so each edge is seen once
+        internal = (
+            edge
+            for node_id in (n['id'] for n in batch_nodes)
+            for source, target, edge in adjacency.get(node_id, ())
+            if source == node_id and target in node_ids
+        )
+        return list(islice(internal, limit))
+    
+    def _create_attack_pattern_batches(self, nodes_by_status: Dict[str, List[Dict]], adjacency: Dict[str, List[Tuple[str, str, Dict]]]) -> List[Dict[str, Any]]:
         """Create batches based on attack patterns and network relationships"""
         batches = []
         
-        # Find attacked nodes and their relationships
-        attacked_nodes = [n for n in nodes if n.get('status') == 'attacked']
-        suspicious_nodes = [n for n in nodes if n.get('status') == 'suspicious']
+        # Attacked and suspicious nodes, already bucketed by the caller
+        attacked_nodes = nodes_by_status['attacked']
+        suspicious_nodes = nodes_by_status['suspicious']
         
         # Batch 1: Show attacked nodes first (most critical)
         if attacked_nodes:
@@ -89,15 +339,11 @@ class NetworkBatchProcessor:
                 'edges': [],
                 'description': 'Critical: Nodes under attack',
                 'priority': 'critical',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': self.batch_timestamp
             }
             
             # Add edges connected to attacked nodes
-            attacked_node_ids = {n['id'] for n in attack_batch['nodes']}
-            attack_edges = [e for e in edges if 
-                          e.get('source_id') in attacked_node_ids or 
-                          e.get('target_id') in attacked_node_ids]
-            attack_batch['edges'] = attack_edges[:self.batch_size * 2]  # Limit edges
+            attack_batch['edges'] = self._incident_edges(attack_batch['nodes'], adjacency, self.batch_size * 2)  # Limit edges
             
             batches.append(attack_batch)
         
@@ -109,34 +355,22 @@ class NetworkBatchProcessor:
                 'edges': [],
                 'description': 'Suspicious activity detected',
                 'priority': 'high',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': self.batch_timestamp
             }
             
             # Add edges connected to suspicious nodes
-            suspicious_node_ids = {n['id'] for n in suspicious_batch['nodes']}
-            suspicious_edges = [e for e in edges if 
-                              e.get('source_id') in suspicious_node_ids or 
-                              e.get('target_id') in suspicious_node_ids]
-            suspicious_batch['edges'] = suspicious_edges[:self.batch_size * 2]
+            suspicious_batch['edges'] = self._incident_edges(suspicious_batch['nodes'], adjacency, self.batch_size * 2)
             
             batches.append(suspicious_batch)
         
         return batches
     
-    def _create_geographic_batches(self, nodes: List[Dict], edges: List[Dict]) -> List[Dict[str, Any]]:
+    def _create_geographic_batches(self, nodes_by_city: Dict[str, List[Dict]], adjacency: Dict[str, List[Tuple[str, str, Dict]]]) -> List[Dict[str, Any]]:
         """Create batches based on geographic distribution"""
         batches = []
         
-        # Group nodes by city
-        city_groups = {}
-        for node in nodes:
-            city = node.get('city', 'Unknown')
-            if city not in city_groups:
-                city_groups[city] = []
-            city_groups[city].append(node)
-        
         # Create batches for each city (if enough nodes)
-        for city, city_nodes in city_groups.items():
+        for city, city_nodes in nodes_by_city.items():
             if len(city_nodes) >= 3 and len(batches) < 8:  # Limit batches
                 city_batch = {
                     'batch_number': len(batches),
@@ -144,67 +378,112 @@ class NetworkBatchProcessor:
                     'edges': [],
                     'description': f'Network activity in {city}',
                     'priority': 'medium',
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': self.batch_timestamp
                 }
                 
                 # Add edges within this city
-                city_node_ids = {n['id'] for n in city_batch['nodes']}
-                city_edges = [e for e in edges if 
-                            e.get('source_id') in city_node_ids and 
-                            e.get('target_id') in city_node_ids]
-                city_batch['edges'] = city_edges[:self.batch_size]
+                city_batch['edges'] = self._internal_edges(city_batch['nodes'], adjacency, self.batch_size)
                 
                 batches.append(city_batch)
         
         return batches
     
-    def _create_random_batches(self, nodes: List[Dict], edges: List[Dict]) -> List[Dict[str, Any]]:
-        """Create random batches for remaining nodes"""
-        batches = []
-        
-        # Shuffle nodes for random distribution
-        random.shuffle(nodes)
+    def _create_random_batches(self, nodes: List[Dict], adjacency: Dict[str, List[Tuple[str, str, Dict]]]) -> Iterator[Dict[str, Any]]:
+        """Lazily create random batches for remaining nodes"""
+        batch_number = 0
         
-        # Create batches of remaining nodes
+        # Shuffle nodes for random distribution one batch at a time (Fisher-Yates),
+        # so batches that are never requested cost nothing
+        nodes = list(nodes)
         for i in range(0, len(nodes), self.batch_size):
-            batch_nodes = nodes[i:i + self.batch_size]
+            end = min(i + self.batch_size, len(nodes))
+            for j in range(i, end):
+                k = random.randrange(j, len(nodes))
+                nodes[j], nodes[k] = nodes[k], nodes[j]
+            batch_nodes = nodes[i:end]
             
             batch = {
-                'batch_number': len(batches),
+                'batch_number': batch_number,
                 'nodes': batch_nodes,
                 'edges': [],
                 'description': f'Additional network nodes',
                 'priority': 'low',
-                'timestamp': datetime.now().isoformat()
+                'timestamp': self.batch_timestamp
             }
             
             # Add random edges for these nodes
-            batch_node_ids = {n['id'] for n in batch_nodes}
-            batch_edges = [e for e in edges if 
-                          e.get('source_id') in batch_node_ids and 
-                          e.get('target_id') in batch_node_ids]
-            batch['edges'] = batch_edges[:self.batch_size]
+            batch['edges'] = self._internal_edges(batch_nodes, adjacency, self.batch_size)
             
-            batches.append(batch)
-        
-        return batches
+            batch_number += 1
+            yield batch
     
-    def _get_remaining_nodes(self, all_nodes: List[Dict], batches: List[Dict]) -> List[Dict]:
-        """Get nodes that haven't been included in any batch yet"""
-        used_node_ids = set()
-        for batch in batches:
-            for node in batch.get('nodes', []):
-                used_node_ids.add(node['id'])
-        
-        return [n for n in all_nodes if n['id'] not in used_node_ids]
+    def get_batch(self, index: int) -> Optional[Dict[str, Any]]:
+        """Get the batch at `index`, building pending random batches up to it"""
+        while len(self.batches) <= index:
+            batch = next(self.pending_batches, None)
+            if batch is None:
+                return None
+            self.batches.append(batch)
+        return self.batches[index]
+    
+    def get_encoded_batch(self, index: int) -> Optional[bytes]:
+        """
+        Get the JSON encoding of the batch at `index`, built once and shared by every stream.
+        It omits STREAM_FIELDS and the closing brace so per-send fields can be appended to it.
+        """
+        while len(self.encoded_batches) <= index:
+            batch = self.get_batch(len(self.encoded_batches))
+            if batch is None:
+                return None
+            self.encoded_batches.append(
+                orjson.dumps({k: v for k, v in batch.items() if k not in STREAM_FIELDS})[:-1]
+            )
+        return self.encoded_batches[index]
+    
+    def get_compact_batches(self) -> Dict[str, Any]:
+        """
+        Encode all batches as one catalog message plus per-batch index lists.
+        The catalog holds every node and edge once; each compact batch carries its
+        metadata with `n`/`e` lists of catalog indices instead of full records.
+        Batch encodings omit STREAM_FIELDS and the closing brace like get_encoded_batch.
+        """
+        if self.compact_batches is None:
+            node_index: Dict[str, int] = {}
+            edge_index: Dict[int, int] = {}
+            catalog_nodes, catalog_edges, encoded = [], [], []
+            for batch in self.get_all_batches():
+                node_refs = []
+                for node in batch['nodes']:
+                    ref = node_index.get(node['id'])
+                    if ref is None:
+                        ref = node_index[node['id']] = len(catalog_nodes)
+                        catalog_nodes.append(node)
+                    node_refs.append(ref)
+                edge_refs = []
+                for edge in batch['edges']:
+                    ref = edge_index.get(id(edge))
+                    if ref is None:
+                        ref = edge_index[id(edge)] = len(catalog_edges)
+                        catalog_edges.append(edge)
+                    edge_refs.append(ref)
+                compact = {k: v for k, v in batch.items()
+                           if k not in STREAM_FIELDS and k != 'nodes' and k != 'edges'}
+                compact['n'] = node_refs
+                compact['e'] = edge_refs
+                encoded.append(orjson.dumps(compact)[:-1])
+            
+            self.compact_batches = {
+                'catalog': orjson.dumps({'type': 'catalog', 'nodes': catalog_nodes, 'edges': catalog_edges}),
+                'encoded': encoded
+            }
+        return self.compact_batches
     
     def get_next_batch(self) -> Optional[Dict[str, Any]]:
         """Get the next batch in sequence"""
-        if self.current_batch_index < len(self.batches):
-            batch = self.batches[self.current_batch_index]
+        batch = self.get_batch(self.current_batch_index)
+        if batch is not None:
             self.current_batch_index += 1
-            return batch
-        return None
+        return batch
     
     def reset_batches(self):
         """Reset to first batch"""
@@ -213,15 +492,16 @@ class NetworkBatchProcessor:
     def get_batch_info(self) -> Dict[str, Any]:
         """Get information about the batch processing"""
         return {
-            'total_batches': len(self.batches),
+            'total_batches': self.total_batches,
             'current_batch': self.current_batch_index,
             'batch_size': self.batch_size,
             'batch_interval': self.batch_interval,
-            'remaining_batches': len(self.batches) - self.current_batch_index
+            'remaining_batches': self.total_batches - self.current_batch_index
         }
     
     def get_all_batches(self) -> List[Dict[str, Any]]:
-        """Get all batches (for debugging)"""
+        """Get all batches (for debugging), building any that are still pending"""
+        self.batches.extend(self.pending_batches)
         return self.batches
 
 
@@ -233,6 +513,8 @@ class CountryBatchManager:
     def __init__(self, processed_data_dir: str = "data/processed"):
         self.processed_data_dir = processed_data_dir
         self.country_processors = {}
+        # Every country seen in data loaded by the country processors
+        self.loaded_countries: set = set()
         self.available_datasets = [
             "DrDoS_DNS.json", "DrDoS_LDAP.json", "DrDoS_MSSQL.json", 
             "DrDoS_NetBIOS.json", "DrDoS_NTP.json", "DrDoS_SNMP.json",
@@ -245,7 +527,16 @@ class CountryBatchManager:
         """
         Get batches for a specific country from available datasets
         """
-        if country not in self.country_processors:
+        processor = self.get_country_processor(country, dataset)
+        return processor.get_all_batches() if processor else []
+    
+    def get_country_processor(self, country: str, dataset: str = None) -> Optional[NetworkBatchProcessor]:
+        """
+        Get the batch processor for a specific country, loading it from available datasets.
+        Returns None when no batches can be made for the country or a similarly named one.
+        """
+        processor = self.country_processors.get(country)
+        if processor is None:
             # Select dataset for this country
             if not dataset:
                 dataset = random.choice(self.available_datasets)
@@ -254,50 +545,47 @@ class CountryBatchManager:
             
             # Create processor for this country
             processor = NetworkBatchProcessor(batch_size=20, batch_interval=3.0)
-            data = processor.load_processed_data(file_path)
+            data = processor.load_processed_data(file_path, country_filter=country)
+            self.loaded_countries |= processor.countries
             
             if not data or not data.get('nodes'):
-                print(f"No data found for {country} in {dataset}")
+                logger.info("No data found for %s in %s", country, dataset)
                 # Try a different dataset
                 for fallback_dataset in self.available_datasets:
                     if fallback_dataset != dataset:
                         fallback_path = f"{self.processed_data_dir}/{fallback_dataset}"
-                        fallback_data = processor.load_processed_data(fallback_path)
+                        fallback_data = processor.load_processed_data(fallback_path, country_filter=country)
+                        self.loaded_countries |= processor.countries
                         if fallback_data and fallback_data.get('nodes'):
-                            print(f"Using fallback dataset {fallback_dataset} for {country}")
+                            logger.info("Using fallback dataset %s for %s", fallback_dataset, country)
                             data = fallback_data
                             break
                 
                 if not data or not data.get('nodes'):
-                    print(f"No data found in any dataset for {country}")
+                    logger.warning("No data found in any dataset for %s", country)
                     self.country_processors[country] = processor
-                    return []
+                    return None
             
             # Filter by country to get only relevant data
             processor.create_logical_batches(country_filter=country)
             self.country_processors[country] = processor
         
-        batches = self.country_processors[country].get_all_batches()
-        if not batches:
-            print(f"No batches created for {country}")
-            # Try to find similar country names
-            available_countries = set()
-            for processor in self.country_processors.values():
-                if processor.processed_data:
-                    countries = {node.get('country') for node in processor.processed_data.get('nodes', [])}
-                    available_countries.update(countries)
-            
-            if available_countries:
-                print(f"Available countries: {sorted(available_countries)}")
-                # Try to find a similar country name
-                for available_country in available_countries:
-                    if country.lower() in available_country.lower() or available_country.lower() in country.lower():
-                        print(f"Using similar country: {available_country}")
-                        return self.get_country_batches(available_country)
+        if not processor.total_batches:
+            logger.warning("No batches created for %s", country)
+            # Try to find a similar country name among the countries loaded so far
+            wanted = country.lower()
+            similar_country = next(
+                (c for c in self.loaded_countries
+                 if c != country and (wanted in c.lower() or c.lower() in wanted)),
+                None
+            )
+            if similar_country:
+                logger.info("Using similar country: %s", similar_country)
+                return self.get_country_processor(similar_country)
             
-            return []
+            return None
         
-        return batches
+        return processor
     
     def get_available_countries(self) -> List[str]:
         """Get list of available countries in the datasets"""
@@ -305,23 +593,20 @@ class CountryBatchManager:
         for dataset in self.available_datasets:
             file_path = f"{self.processed_data_dir}/{dataset}"
             try:
-                with open(file_path, 'r') as f:
-                    data = json.load(f)
-                    countries = {node.get('country') for node in data.get('nodes', []) if node.get('country')}
-                    available_countries.update(countries)
-                    print(f"Found countries in {dataset}: {sorted(countries)}")
+                # Cached per (path, mtime), so only new or changed datasets are parsed
+                available_countries.update(_dataset_countries(file_path, os.path.getmtime(file_path)))
             except Exception as e:
-                print(f"Error reading {dataset}: {e}")
-                continue
+                logger.error("Error reading %s: %s", dataset, e)
         
-        result = sorted(list(available_countries))
-        print(f"Total available countries: {result}")
+        result = sorted(available_countries)
+        logger.debug("Total available countries: %s", result)
         return result
     
     def reset_country_batches(self, country: str):
         """Reset batches for a specific country"""
-        if country in self.country_processors:
-            self.country_processors[country].reset_batches()
+        processor = self.country_processors.get(country)
+        if processor is not None:
+            processor.reset_batches()
 
 
 # Global instance
@@ -5,9 +5,84 @@ Provides progressive revelation of network nodes and edges
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, Any, List, Optional
 import asyncio
-import json
+import logging
+import orjson
 from datetime import datetime
 from agents.batch_processor import country_batch_manager
+from agents.stream_broker import StreamBroker
+
+logger = logging.getLogger(__name__)
+
+# Frames a country stream keeps for late joiners and buffers per slow client
+COUNTRY_STREAM_QUEUE_SIZE = 1024
+
+
+async def send_message(websocket: WebSocket, message: Dict[str, Any]):
+    """Send a JSON message encoded with orjson (as a text frame, which the client JSON.parses)"""
+    await websocket.send_text(orjson.dumps(message).decode())
+
+
+def batch_frame(encoded: bytes, batch_number: int, total_batches: int, elapsed_time: float) -> bytes:
+    """Complete a pre-encoded batch (see NetworkBatchProcessor.get_encoded_batch) with its per-send fields"""
+    return b'%s,"batch_number":%d,"total_batches":%d,"elapsed_time":%s,"type":"batch"}' % (
+        encoded, batch_number, total_batches, orjson.dumps(elapsed_time)
+    )
+
+
+def new_stream_controls() -> Dict[str, Any]:
+    """Pacing state shared by a stream loop and the task reading its client's messages"""
+    return {
+        'is_streaming': False,
+        'is_paused': False,
+        'next_event': asyncio.Event()
+    }
+
+
+def control_stream(stream_state: Dict[str, Any], command: str):
+    """Apply a client control message ('next', 'pause_stream', 'resume_stream', 'stop_stream')"""
+    if command == 'pause_stream':
+        stream_state['is_paused'] = True
+    elif command == 'resume_stream':
+        stream_state['is_paused'] = False
+    elif command == 'stop_stream':
+        stream_state['is_paused'] = False
+        stream_state['is_streaming'] = False
+    elif command != 'next':
+        return
+    # Wake the stream loop so it re-checks its state straight away
+    stream_state['next_event'].set()
+
+
+async def wait_for_next(stream_state: Dict[str, Any], batch_interval: float):
+    """
+    Wait until the client asks for the next batch, at most `batch_interval` seconds.
+    While the stream is paused there is no time limit; resuming or stopping ends the wait.
+    """
+    next_event = stream_state['next_event']
+    while True:
+        timeout = None if stream_state['is_paused'] else batch_interval
+        try:
+            await asyncio.wait_for(next_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        next_event.clear()
+        if not stream_state['is_paused']:
+            return
+
+
+async def receive_client_messages(websocket: WebSocket, stream_state: Dict[str, Any]):
+    """Read control messages from the client until it disconnects"""
+    try:
+        while True:
+            try:
+                message = orjson.loads(await websocket.receive_text())
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(message, dict):
+                control_stream(stream_state, message.get('type'))
+    except (WebSocketDisconnect, RuntimeError):
+        control_stream(stream_state, 'stop_stream')
+
 
 class BatchStreamManager:
     """Manages WebSocket connections for batch streaming"""
@@ -25,47 +100,49 @@ class BatchStreamManager:
         # Initialize stream state for this country
         self.country_streams[connection_id] = {
             'country': country,
-            'is_streaming': False,
             'current_batch': 0,
             'total_batches': 0,
-            'start_time': None
+            'start_time': None,
+            **new_stream_controls()
         }
         
-        print(f"Batch stream connected for {country}. Connection ID: {connection_id}")
+        logger.info("Batch stream connected for %s. Connection ID: %s", country, connection_id)
         return connection_id
     
     def disconnect(self, connection_id: str):
         """Remove WebSocket connection"""
-        if connection_id in self.active_connections:
-            del self.active_connections[connection_id]
-        if connection_id in self.country_streams:
-            del self.country_streams[connection_id]
-        print(f"Batch stream disconnected: {connection_id}")
+        self.active_connections.pop(connection_id, None)
+        self.country_streams.pop(connection_id, None)
+        logger.info("Batch stream disconnected: %s", connection_id)
     
     async def start_country_batch_stream(
         self, 
         connection_id: str, 
         country: str,
-        batch_interval: float = 3.0
+        batch_interval: float = 3.0,
+        compact: bool = False
     ):
         """
         Start streaming batches for a specific country
+        With `compact`, a catalog message carrying every node and edge is sent first
+        and batch messages reference it by index (see NetworkBatchProcessor.get_compact_batches)
         """
-        if connection_id not in self.active_connections:
-            print(f"Connection {connection_id} not found in active connections")
+        websocket = self.active_connections.get(connection_id)
+        if websocket is None:
+            logger.warning("Connection %s not found in active connections", connection_id)
             return
         
-        websocket = self.active_connections[connection_id]
         stream_state = self.country_streams[connection_id]
+        receiver = asyncio.create_task(receive_client_messages(websocket, stream_state))
         
         try:
             # Get batches for this country
-            print(f"Getting batches for country: {country}")
-            batches = country_batch_manager.get_country_batches(country)
+            logger.debug("Getting batches for country: %s", country)
+            processor = country_batch_manager.get_country_processor(country)
             
-            if not batches:
-                print(f"No batches found for {country}")
-                await websocket.send_json({
+            if processor is None:
+                logger.warning("No batches found for %s", country)
+                await send_message(websocket, {
                     "type": "error",
                     "message": f"No data available for {country}",
                     "timestamp": datetime.now().isoformat()
@@ -73,85 +150,97 @@ class BatchStreamManager:
                 return
             
             stream_state['is_streaming'] = True
-            stream_state['total_batches'] = len(batches)
-            stream_state['start_time'] = datetime.now().timestamp()
+            total_batches = processor.total_batches
+            stream_state['total_batches'] = total_batches
+            loop = asyncio.get_running_loop()
+            stream_state['start_time'] = loop.time()
             
             # Send initial connection confirmation
-            print(f"Sending connection confirmation for {country} with {len(batches)} batches")
-            await websocket.send_json({
+            logger.debug("Sending connection confirmation for %s with %d batches", country, total_batches)
+            await send_message(websocket, {
                 "type": "connection",
                 "status": "connected",
                 "country": country,
-                "total_batches": len(batches),
+                "total_batches": total_batches,
                 "batch_interval": batch_interval,
-                "message": f"Starting batch stream for {country} with {len(batches)} batches",
+                "format": "compact" if compact else "full",
+                "message": f"Starting batch stream for {country} with {total_batches} batches",
                 "timestamp": datetime.now().isoformat()
             })
             
+            if compact:
+                compact_batches = processor.get_compact_batches()
+                await websocket.send_text(compact_batches['catalog'].decode())
+            
             # Stream each batch
-            for i, batch in enumerate(batches):
+            for i in range(total_batches):
                 if not stream_state['is_streaming']:
                     break
                 
-                # Update batch info
-                batch['batch_number'] = i
-                batch['total_batches'] = len(batches)
-                batch['elapsed_time'] = datetime.now().timestamp() - stream_state['start_time']
-                batch['type'] = "batch"
-                
-                # Send batch data
-                print(f"Sending batch {i+1}/{len(batches)} for {country} with {len(batch.get('nodes', []))} nodes")
-                await websocket.send_json(batch)
+                # Send batch data, completing the shared encoding with this stream's batch info
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Sending batch %d/%d for %s with %d nodes",
+                                 i + 1, total_batches, country, len(processor.get_batch(i)['nodes']))
+                elapsed_time = loop.time() - stream_state['start_time']
+                encoded = compact_batches['encoded'][i] if compact else processor.get_encoded_batch(i)
+                frame = batch_frame(encoded, i, total_batches, elapsed_time)
+                await websocket.send_text(frame.decode())
                 
                 stream_state['current_batch'] = i + 1
                 
-                # Wait before next batch (except for last batch)
-                if i < len(batches) - 1:
-                    await asyncio.sleep(batch_interval)
+                # Wait for the client to ask for the next batch (except for last batch)
+                if i < total_batches - 1:
+                    await wait_for_next(stream_state, batch_interval)
             
             # Send completion message
-            await websocket.send_json({
+            await send_message(websocket, {
                 "type": "complete",
                 "country": country,
-                "total_batches_sent": len(batches),
+                "total_batches_sent": total_batches,
                 "message": f"Batch stream completed for {country}",
                 "timestamp": datetime.now().isoformat()
             })
             
         except WebSocketDisconnect:
-            print(f"Client disconnected during batch stream for {country}")
+            logger.info("Client disconnected during batch stream for %s", country)
             self.disconnect(connection_id)
         except Exception as e:
-            print(f"Error in batch stream for {country}: {e}")
-            await websocket.send_json({
+            logger.exception("Error in batch stream for %s", country)
+            await send_message(websocket, {
                 "type": "error",
                 "message": f"Stream error: {str(e)}",
                 "timestamp": datetime.now().isoformat()
             })
             self.disconnect(connection_id)
+        finally:
+            receiver.cancel()
     
     async def pause_stream(self, connection_id: str):
         """Pause the current stream"""
-        if connection_id in self.country_streams:
-            self.country_streams[connection_id]['is_streaming'] = False
+        state = self.country_streams.get(connection_id)
+        if state is not None:
+            control_stream(state, 'pause_stream')
     
     async def resume_stream(self, connection_id: str):
         """Resume the current stream"""
-        if connection_id in self.country_streams:
-            self.country_streams[connection_id]['is_streaming'] = True
+        state = self.country_streams.get(connection_id)
+        if state is not None:
+            control_stream(state, 'resume_stream')
     
     async def stop_stream(self, connection_id: str):
         """Stop the current stream"""
-        if connection_id in self.country_streams:
-            self.country_streams[connection_id]['is_streaming'] = False
+        state = self.country_streams.get(connection_id)
+        if state is not None:
+            control_stream(state, 'stop_stream')
     
     def get_stream_status(self, connection_id: str) -> Optional[Dict[str, Any]]:
         """Get current stream status"""
-        if connection_id in self.country_streams:
-            state = self.country_streams[connection_id]
+        state = self.country_streams.get(connection_id)
+        if state is not None:
             return {
                 'country': state['country'],
                 'is_streaming': state['is_streaming'],
+                'is_paused': state['is_paused'],
                 'current_batch': state['current_batch'],
                 'total_batches': state['total_batches'],
                 'progress_percentage': (state['current_batch'] / state['total_batches'] * 100) if state['total_batches'] > 0 else 0
@@ -162,69 +251,139 @@ class BatchStreamManager:
 # Global batch stream manager
 batch_stream_manager = BatchStreamManager()
 
+# Global per-country fan-out for handle_batch_stream_websocket
+country_stream_broker = StreamBroker(queue_size=COUNTRY_STREAM_QUEUE_SIZE)
 
-async def handle_batch_stream_websocket(websocket: WebSocket, country: str):
+
+async def country_batch_frames(country: str, compact: bool = False):
     """
-    WebSocket endpoint for streaming network data in batches
+    Produce the encoded messages of one simulated batch stream for a country.
+    Runs once per country and format however many clients are connected (see country_stream_broker).
     """
-    await websocket.accept()
-    print(f"WebSocket connection accepted for {country}")
+    def encode(message: Dict[str, Any]) -> bytes:
+        return orjson.dumps(message)
     
     try:
         # Get batches for this country
-        batches = country_batch_manager.get_country_batches(country)
+        processor = country_batch_manager.get_country_processor(country)
         
-        if not batches:
-            await websocket.send_json({
+        if processor is None:
+            yield encode({
                 "type": "error",
                 "message": f"No data available for {country}",
                 "timestamp": datetime.now().isoformat()
             })
             return
         
-        # Send initial connection confirmation
-        await websocket.send_json({
+        total_batches = processor.total_batches
+        
+        # Initial connection confirmation
+        yield encode({
             "type": "connection",
             "status": "connected",
             "country": country,
-            "total_batches": len(batches),
+            "total_batches": total_batches,
             "batch_interval": 3.0,
-            "message": f"Starting batch stream for {country} with {len(batches)} batches",
+            "format": "compact" if compact else "full",
+            "message": f"Starting batch stream for {country} with {total_batches} batches",
             "timestamp": datetime.now().isoformat()
         })
         
-        # Stream each batch
-        for i, batch in enumerate(batches):
-            # Update batch info
-            batch['batch_number'] = i
-            batch['total_batches'] = len(batches)
-            batch['elapsed_time'] = i * 3.0  # Simulate elapsed time
-            batch['type'] = "batch"
-            
-            # Send batch data
-            await websocket.send_json(batch)
-            print(f"Sent batch {i+1}/{len(batches)} for {country}")
+        if compact:
+            compact_batches = processor.get_compact_batches()
+            yield compact_batches['catalog']
+        
+        # Each batch with simulated elapsed time
+        for i in range(total_batches):
+            encoded = compact_batches['encoded'][i] if compact else processor.get_encoded_batch(i)
+            yield batch_frame(encoded, i, total_batches, i * 3.0)
+            logger.debug("Sent batch %d/%d for %s", i + 1, total_batches, country)
             
             # Wait before next batch (except for last batch)
-            if i < len(batches) - 1:
+            if i < total_batches - 1:
                 await asyncio.sleep(3.0)
         
-        # Send completion message
-        await websocket.send_json({
+        # Completion message
+        yield encode({
             "type": "complete",
             "message": f"Batch stream completed for {country}",
             "timestamp": datetime.now().isoformat()
         })
+    except Exception as e:
+        logger.exception("Batch stream error for %s", country)
+        yield encode({
+            "type": "error",
+            "message": f"Stream error: {str(e)}",
+            "timestamp": datetime.now().isoformat()
+        })
+
+
+async def read_shared_frame(queue: asyncio.Queue, stream_state: Dict[str, Any]) -> Optional[bytes]:
+    """
+    Wait for the next frame of a broker subscription or for a client control message, whichever comes first.
+    Returns the frame, or None when woken by a control message (check stream_state) or when the run completed.
+    """
+    next_event = stream_state['next_event']
+    frame_task = asyncio.ensure_future(queue.get())
+    wake_task = asyncio.ensure_future(next_event.wait())
+    try:
+        await asyncio.wait({frame_task, wake_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        wake_task.cancel()
+        if not frame_task.done():
+            # Cancelling a pending Queue.get() leaves the frame in the queue
+            frame_task.cancel()
+    next_event.clear()
+    if frame_task.done() and not frame_task.cancelled():
+        frame = frame_task.result()
+        if frame is None:
+            stream_state['is_streaming'] = False
+        return frame
+    return None
+
+
+async def handle_batch_stream_websocket(websocket: WebSocket, country: str, compact: bool = False):
+    """
+    WebSocket endpoint for streaming network data in batches
+    Clients of the same country share one producer; late joiners first receive
+    the messages already sent, then follow the live stream
+    `compact` selects catalog + index batch messages (see start_country_batch_stream)
+
+    The shared producer sends a batch every 3 seconds for all clients, so a
+    client cannot pull batches sooner: `next` messages are ignored on this
+    endpoint. pause_stream / resume_stream / stop_stream apply to this client
+    only, and stop or a disconnect ends its subscription straight away.
+    """
+    await websocket.accept()
+    logger.info("WebSocket connection accepted for %s", country)
+    stream_state = new_stream_controls()
+    stream_state['is_streaming'] = True
+    receiver = asyncio.create_task(receive_client_messages(websocket, stream_state))
+    stream_id = f"{country}?compact" if compact else country
+    queue = country_stream_broker.subscribe(stream_id, lambda: country_batch_frames(country, compact))
+    
+    try:
+        while stream_state['is_streaming']:
+            # A paused client stops reading; its queue keeps the newest frames meanwhile
+            if stream_state['is_paused']:
+                await wait_for_next(stream_state, 3.0)
+                continue
+            frame = await read_shared_frame(queue, stream_state)
+            if frame is not None and stream_state['is_streaming']:
+                await websocket.send_text(frame.decode())
         
     except WebSocketDisconnect:
-        print(f"Client disconnected: {country}")
+        logger.info("Client disconnected: %s", country)
     except Exception as e:
-        print(f"WebSocket error for {country}: {e}")
+        logger.exception("WebSocket error for %s", country)
         try:
-            await websocket.send_json({
+            await send_message(websocket, {
                 "type": "error",
                 "message": f"Stream error: {str(e)}",
                 "timestamp": datetime.now().isoformat()
             })
         except:
             pass
+    finally:
+        receiver.cancel()
+        country_stream_broker.unsubscribe(stream_id, queue)
@@ -7,15 +7,35 @@ import asyncio
 import json
 import os
 import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, AsyncGenerator
 from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
+import numpy as np
+import orjson
 import random
 
-# Event data model
-class CICEvent(BaseModel):
+# SSE framing, kept as bytes so frames are built by concatenation
+SSE_DATA_PREFIX = b"data: "
+SSE_FRAME_SUFFIX = b"\n\n"
+
+# Stats cover this many of the newest events (the default /events page)
+STATS_EVENT_LIMIT = 10
+
+# Events due within this many seconds of each other go out in one write
+STREAM_TICK_SECONDS = 0.016
+
+# Encoded /events pages kept per scenario load before the cache starts over
+EVENTS_CACHE_SIZE = 256
+
+# Internal event record, serialized directly by orjson at the HTTP boundary.
+# Scenario lists are shared between requests, so records are immutable once generated.
+@dataclass(slots=True, frozen=True)
+class ReplayEvent:
     ts: str
     incident_id: str
     severity: str  # "OK" | "WARN" | "ALERT"
@@ -40,54 +60,241 @@ class CICStats(BaseModel):
 class ScenarioRequest(BaseModel):
     name: str  # "benign" | "mixed" | "ddos"
 
+# Random source for the vectorized scenario generators
+_rng = np.random.default_rng()
+
+
+def _timestamp_series(start: datetime, step: timedelta, count: int) -> List[str]:
+    """ISO timestamps start, start + step, ... for `count` events"""
+    series = np.datetime64(start, 'us') + np.arange(count) * np.timedelta64(step)
+    return np.datetime_as_string(series, unit='us').tolist()
+
+
+def _event_columns(events: List[ReplayEvent]) -> Dict[str, np.ndarray]:
+    """Column arrays of the fields the aggregations read, parallel to `events`"""
+    timestamps = np.array([event.ts.rstrip('Z') for event in events], dtype='datetime64[us]')
+    return {
+        "ts_epoch": timestamps.astype(np.int64) / 1e6,
+        "severity": np.array([event.severity for event in events], dtype=str),
+        "countryCode": np.array([event.countryCode for event in events], dtype=str),
+        "incident_id": np.array([event.incident_id for event in events], dtype=str)
+    }
+
+
+def _draw_severities(severity_weights: Dict[str, float], count: int) -> List[str]:
+    """Draw `count` severities following the given weights"""
+    names = list(severity_weights)
+    weights = np.fromiter(severity_weights.values(), dtype=float)
+    draws = _rng.choice(len(names), size=count, p=weights / weights.sum())
+    return [names[i] for i in draws.tolist()]
+
+
+# Pre-formatted addresses the generators sample from instead of formatting one per event
+IP_POOL_SIZE = 10000
+_IP_POOL = ["%d.%d.%d.%d" % tuple(octets) for octets in _rng.integers(1, 256, (IP_POOL_SIZE, 4)).tolist()]
+_LAN_IP_POOL = ["192.168.%d.%d" % tuple(octets) for octets in _rng.integers(1, 256, (IP_POOL_SIZE, 2)).tolist()]
+
+
+def _random_ips(count: int, pool: List[str] = _IP_POOL) -> List[str]:
+    """`count` random IPv4 addresses sampled from a pre-formatted pool"""
+    return [pool[i] for i in _rng.integers(0, len(pool), count).tolist()]
+
+
+# Scenario vocabularies as (name, code) pairs and reason strings, shared by every generator call
+BENIGN_COUNTRIES = (
+    ("United States", "US"),
+    ("Canada", "CA"),
+    ("United Kingdom", "GB"),
+    ("Germany", "DE"),
+    ("France", "FR"),
+    ("Japan", "JP"),
+    ("Australia", "AU"),
+    ("Netherlands", "NL"),
+    ("Sweden", "SE"),
+    ("Switzerland", "CH")
+)
+
+MIXED_COUNTRIES = (
+    ("United States", "US"),
+    ("China", "CN"),
+    ("Russia", "RU"),
+    ("Germany", "DE"),
+    ("United Kingdom", "GB"),
+    ("France", "FR"),
+    ("Japan", "JP"),
+    ("South Korea", "KR"),
+    ("India", "IN"),
+    ("Brazil", "BR"),
+    ("Canada", "CA"),
+    ("Australia", "AU"),
+    ("Netherlands", "NL"),
+    ("Singapore", "SG"),
+    ("Israel", "IL"),
+    ("Ukraine", "UA")
+)
+
+DDOS_COUNTRIES = (
+    ("United States", "US"),
+    ("China", "CN"),
+    ("Russia", "RU"),
+    ("North Korea", "KP"),
+    ("Iran", "IR"),
+    ("Germany", "DE"),
+    ("United Kingdom", "GB"),
+    ("France", "FR"),
+    ("Japan", "JP"),
+    ("South Korea", "KR")
+)
+
+MIXED_WARN_REASONS = (
+    "Unusual traffic spike detected",
+    "Port scan activity observed",
+    "Suspicious connection pattern",
+    "Anomalous data transfer",
+    "Potential reconnaissance activity"
+)
+
+MIXED_ALERT_REASONS = (
+    "DDoS attack detected",
+    "Ransomware campaign in progress",
+    "APT infiltration attempt",
+    "Zero-day exploit detected",
+    "Data exfiltration in progress"
+)
+
+DDOS_WARN_REASONS = (
+    "Suspicious traffic pattern",
+    "Potential DDoS precursor",
+    "Unusual connection behavior",
+    "Anomalous packet patterns"
+)
+
+DDOS_ALERT_REASONS = (
+    "DDoS volumetric attack in progress",
+    "Distributed denial of service detected",
+    "Massive traffic flood targeting infrastructure",
+    "Botnet-driven DDoS campaign",
+    "Multi-vector DDoS attack"
+)
+
+# Fresh (live) events: reasons, changes and next steps per severity
+FRESH_REASONS = {
+    "OK": (
+        "Normal traffic pattern detected",
+        "Regular network activity",
+        "Standard communication flow",
+        "Baseline traffic observed"
+    ),
+    "WARN": (
+        "Unusual traffic pattern detected",
+        "Traffic volume spike observed",
+        "Suspicious network behavior",
+        "Anomalous connection pattern"
+    ),
+    "ALERT": (
+        "Potential cyber attack detected",
+        "Critical security breach detected",
+        "APT infiltration attempt",
+        "Malicious activity identified"
+    )
+}
+
+FRESH_CHANGES = {
+    "OK": (
+        "No significant changes",
+        "Traffic within normal parameters",
+        "Standard operational status"
+    ),
+    "WARN": (
+        "Traffic volume increased by 150%",
+        "Unusual connection frequency",
+        "Network behavior deviation detected"
+    ),
+    "ALERT": (
+        "Critical security event",
+        "Unauthorized access attempt",
+        "Suspicious data exfiltration"
+    )
+}
+
+FRESH_NEXT_STEPS = {
+    "OK": (
+        "Continue monitoring",
+        "Maintain current security posture",
+        "No action required"
+    ),
+    "WARN": (
+        "Investigate further",
+        "Monitor closely",
+        "Review security logs"
+    ),
+    "ALERT": (
+        "Immediate response required",
+        "Activate incident response",
+        "Block suspicious IPs"
+    )
+}
+
+
 class CICReplayer:
     def __init__(self):
         self.current_scenario = "mixed"
-        self.events: List[CICEvent] = []
-        self.active_incidents: Dict[str, CICEvent] = {}
-        self.country_history: Dict[str, List[CICEvent]] = {}
+        self.events: List[ReplayEvent] = []
+        self.active_incidents: Dict[str, ReplayEvent] = {}
+        self.country_history: Dict[str, List[ReplayEvent]] = {}
+        # Newest-first views of self.events, rebuilt whenever the scenario changes
+        self.sorted_events: List[ReplayEvent] = []
+        self.sorted_events_by_severity: Dict[str, List[ReplayEvent]] = {}
+        self.stats: Optional[CICStats] = None
+        self.stats_body = b""
+        # Bumped on every scenario load so cached responses know when they are stale
+        self.scenario_version = 0
+        # Pre-encoded SSE frames of self.events and their replay offsets in seconds
+        self.stream_frames: List[bytes] = []
+        self.stream_offsets: List[float] = []
         self.replay_speed = 60  # 60x speed
         self.is_streaming = False
+        # Stop signal of each live /stream, so stop_streaming can cut a pacing sleep short
+        self.stop_events: List[asyncio.Event] = []
         
-        # Built-in sample data
-        self.sample_data = {
-            "benign": self._generate_benign_events(),
-            "mixed": self._generate_mixed_events(),
-            "ddos": self._generate_ddos_events()
+        # Built-in sample data, generated on first use of each scenario
+        self.scenario_generators = {
+            "benign": self._generate_benign_events,
+            "mixed": self._generate_mixed_events,
+            "ddos": self._generate_ddos_events
         }
+        self.scenario_cache: Dict[str, List[ReplayEvent]] = {}
+        # Columns of each cached scenario's events, built once when the scenario is generated;
+        # aggregations scan these and only the egress paths touch the event records
+        self.scenario_columns: Dict[str, Dict[str, np.ndarray]] = {}
+        self.event_columns = _event_columns([])
+        # Indices into self.events, newest first
+        self.newest_order: np.ndarray = np.empty(0, dtype=np.intp)
         
-        # Load initial data
-        self._load_scenario_data()
+        # Scenario data is loaded by warm_up, off the event loop; until then every view is empty
+        self._update_stats()
     
-    def _generate_benign_events(self) -> List[CICEvent]:
+    def _generate_benign_events(self) -> List[ReplayEvent]:
         """Generate benign/normal traffic events"""
-        countries = [
-            {"name": "United States", "code": "US"},
-            {"name": "Canada", "code": "CA"},
-            {"name": "United Kingdom", "code": "GB"},
-            {"name": "Germany", "code": "DE"},
-            {"name": "France", "code": "FR"},
-            {"name": "Japan", "code": "JP"},
-            {"name": "Australia", "code": "AU"},
-            {"name": "Netherlands", "code": "NL"},
-            {"name": "Sweden", "code": "SE"},
-            {"name": "Switzerland", "code": "CH"}
-        ]
-        
         events = []
         base_time = datetime.now() - timedelta(minutes=15)  # Start 15 minutes ago instead of 2 hours
+        count = 200
+        
+        # Draw every random column up front
+        timestamps = _timestamp_series(base_time, timedelta(minutes=2), count)
+        country_idx = _rng.integers(0, len(BENIGN_COUNTRIES), count).tolist()
+        ips = _random_ips(count, _LAN_IP_POOL)
         
-        for i in range(200):
-            country = random.choice(countries)
-            timestamp = base_time + timedelta(minutes=i*2)
+        for i in range(count):
+            country_name, country_code = BENIGN_COUNTRIES[country_idx[i]]
             
-            event = CICEvent(
-                ts=timestamp.isoformat(),
+            event = ReplayEvent(
+                ts=timestamps[i],
                 incident_id=f"INC-BENIGN-{i:04d}",
                 severity="OK",
-                country=country["name"],
-                countryCode=country["code"],
-                ip=f"192.168.{random.randint(1,255)}.{random.randint(1,255)}",
+                country=country_name,
+                countryCode=country_code,
+                ip=ips[i],
                 reason="Normal traffic pattern detected",
                 change="No significant changes",
                 status="monitoring",
@@ -97,77 +304,49 @@ class CICReplayer:
         
         return events
     
-    def _generate_mixed_events(self) -> List[CICEvent]:
+    def _generate_mixed_events(self) -> List[ReplayEvent]:
         """Generate mixed normal/suspicious/attack events"""
-        countries = [
-            {"name": "United States", "code": "US"},
-            {"name": "China", "code": "CN"},
-            {"name": "Russia", "code": "RU"},
-            {"name": "Germany", "code": "DE"},
-            {"name": "United Kingdom", "code": "GB"},
-            {"name": "France", "code": "FR"},
-            {"name": "Japan", "code": "JP"},
-            {"name": "South Korea", "code": "KR"},
-            {"name": "India", "code": "IN"},
-            {"name": "Brazil", "code": "BR"},
-            {"name": "Canada", "code": "CA"},
-            {"name": "Australia", "code": "AU"},
-            {"name": "Netherlands", "code": "NL"},
-            {"name": "Singapore", "code": "SG"},
-            {"name": "Israel", "code": "IL"},
-            {"name": "Ukraine", "code": "UA"}
-        ]
-        
         events = []
         base_time = datetime.now() - timedelta(minutes=15)  # Start 15 minutes ago instead of 2 hours
         
         # Generate events with different severity levels
         severity_weights = {"OK": 0.6, "WARN": 0.25, "ALERT": 0.15}
         
-        for i in range(300):
-            country = random.choice(countries)
-            timestamp = base_time + timedelta(minutes=i*1.5)
+        count = 300
+        
+        # Draw every random column up front
+        timestamps = _timestamp_series(base_time, timedelta(minutes=1.5), count)
+        country_idx = _rng.integers(0, len(MIXED_COUNTRIES), count).tolist()
+        severities = _draw_severities(severity_weights, count)
+        reason_draws = _rng.random(count).tolist()
+        ips = _random_ips(count)
+        
+        for i in range(count):
+            country_name, country_code = MIXED_COUNTRIES[country_idx[i]]
             
             # Weighted random severity
-            severity = random.choices(
-                list(severity_weights.keys()),
-                weights=list(severity_weights.values())
-            )[0]
+            severity = severities[i]
             
             if severity == "OK":
                 reason = "Normal traffic pattern detected"
                 change = "No significant changes"
                 next_step = "Continue monitoring"
             elif severity == "WARN":
-                reasons = [
-                    "Unusual traffic spike detected",
-                    "Port scan activity observed",
-                    "Suspicious connection pattern",
-                    "Anomalous data transfer",
-                    "Potential reconnaissance activity"
-                ]
-                reason = random.choice(reasons)
+                reason = MIXED_WARN_REASONS[int(reason_draws[i] * len(MIXED_WARN_REASONS))]
                 change = "Traffic volume increased by 150%"
                 next_step = "Investigate further"
             else:  # ALERT
-                reasons = [
-                    "DDoS attack detected",
-                    "Ransomware campaign in progress",
-                    "APT infiltration attempt",
-                    "Zero-day exploit detected",
-                    "Data exfiltration in progress"
-                ]
-                reason = random.choice(reasons)
+                reason = MIXED_ALERT_REASONS[int(reason_draws[i] * len(MIXED_ALERT_REASONS))]
                 change = "Critical security breach detected"
                 next_step = "Immediate mitigation required"
             
-            event = CICEvent(
-                ts=timestamp.isoformat(),
+            event = ReplayEvent(
+                ts=timestamps[i],
                 incident_id=f"INC-MIXED-{i:04d}",
                 severity=severity,
-                country=country["name"],
-                countryCode=country["code"],
-                ip=f"{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}",
+                country=country_name,
+                countryCode=country_code,
+                ip=ips[i],
                 reason=reason,
                 change=change,
                 status="monitoring" if severity == "OK" else "investigating",
@@ -177,70 +356,49 @@ class CICReplayer:
         
         return events
     
-    def _generate_ddos_events(self) -> List[CICEvent]:
+    def _generate_ddos_events(self) -> List[ReplayEvent]:
         """Generate DDoS attack scenario events"""
-        countries = [
-            {"name": "United States", "code": "US"},
-            {"name": "China", "code": "CN"},
-            {"name": "Russia", "code": "RU"},
-            {"name": "North Korea", "code": "KP"},
-            {"name": "Iran", "code": "IR"},
-            {"name": "Germany", "code": "DE"},
-            {"name": "United Kingdom", "code": "GB"},
-            {"name": "France", "code": "FR"},
-            {"name": "Japan", "code": "JP"},
-            {"name": "South Korea", "code": "KR"}
-        ]
-        
         events = []
         base_time = datetime.now() - timedelta(minutes=15)  # Start 15 minutes ago instead of 2 hours
         
         # Generate mostly attack events
         severity_weights = {"OK": 0.1, "WARN": 0.2, "ALERT": 0.7}
         
-        for i in range(400):
-            country = random.choice(countries)
-            timestamp = base_time + timedelta(minutes=i*1.2)
+        count = 400
+        
+        # Draw every random column up front
+        timestamps = _timestamp_series(base_time, timedelta(minutes=1.2), count)
+        country_idx = _rng.integers(0, len(DDOS_COUNTRIES), count).tolist()
+        severities = _draw_severities(severity_weights, count)
+        reason_draws = _rng.random(count).tolist()
+        ips = _random_ips(count)
+        
+        for i in range(count):
+            country_name, country_code = DDOS_COUNTRIES[country_idx[i]]
             
             # Weighted random severity (mostly attacks)
-            severity = random.choices(
-                list(severity_weights.keys()),
-                weights=list(severity_weights.values())
-            )[0]
+            severity = severities[i]
             
             if severity == "OK":
                 reason = "Normal traffic pattern detected"
                 change = "No significant changes"
                 next_step = "Continue monitoring"
             elif severity == "WARN":
-                reasons = [
-                    "Suspicious traffic pattern",
-                    "Potential DDoS precursor",
-                    "Unusual connection behavior",
-                    "Anomalous packet patterns"
-                ]
-                reason = random.choice(reasons)
+                reason = DDOS_WARN_REASONS[int(reason_draws[i] * len(DDOS_WARN_REASONS))]
                 change = "Traffic patterns showing signs of attack"
                 next_step = "Prepare mitigation measures"
             else:  # ALERT
-                reasons = [
-                    "DDoS volumetric attack in progress",
-                    "Distributed denial of service detected",
-                    "Massive traffic flood targeting infrastructure",
-                    "Botnet-driven DDoS campaign",
-                    "Multi-vector DDoS attack"
-                ]
-                reason = random.choice(reasons)
+                reason = DDOS_ALERT_REASONS[int(reason_draws[i] * len(DDOS_ALERT_REASONS))]
                 change = "Critical infrastructure under attack"
                 next_step = "Activate emergency response"
             
-            event = CICEvent(
-                ts=timestamp.isoformat(),
+            event = ReplayEvent(
+                ts=timestamps[i],
                 incident_id=f"INC-DDOS-{i:04d}",
                 severity=severity,
-                country=country["name"],
-                countryCode=country["code"],
-                ip=f"{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}",
+                country=country_name,
+                countryCode=country_code,
+                ip=ips[i],
                 reason=reason,
                 change=change,
                 status="mitigating" if severity == "ALERT" else "investigating",
@@ -250,268 +408,240 @@ class CICReplayer:
         
         return events
     
+    def _get_scenario(self, scenario_name: str) -> List[ReplayEvent]:
+        """Events of a scenario, generated once and shared read-only afterwards"""
+        events = self.scenario_cache.get(scenario_name)
+        if events is None:
+            # setdefault keeps whichever list landed first if two callers race here
+            events = self.scenario_cache.setdefault(scenario_name, self.scenario_generators[scenario_name]())
+        if scenario_name not in self.scenario_columns:
+            self.scenario_columns.setdefault(scenario_name, _event_columns(events))
+        return events
+    
     def _load_scenario_data(self):
         """Load data for current scenario"""
-        self.events = self.sample_data[self.current_scenario].copy()
+        self.events = self._get_scenario(self.current_scenario)
+        self.event_columns = self.scenario_columns[self.current_scenario]
+        self.scenario_version += 1
+        self._update_sorted_events()
         self._update_active_incidents()
         self._update_country_history()
+        self._update_stats()
+        self._update_stream_frames()
     
     def _update_active_incidents(self):
-        """Update active incidents from events"""
+        """Update active incidents from events, keeping the latest event for each incident_id"""
         self.active_incidents = {}
-        for event in self.events:
-            if event.severity in ["WARN", "ALERT"]:
-                # Keep the latest event for each incident_id
-                if event.incident_id not in self.active_incidents:
-                    self.active_incidents[event.incident_id] = event
-                else:
-                    # Keep the more recent event
-                    if event.ts > self.active_incidents[event.incident_id].ts:
-                        self.active_incidents[event.incident_id] = event
+        order = self.newest_order
+        # Newest first, so the first event seen for an incident is its latest one
+        for i in order[self.event_columns["severity"][order] != "OK"].tolist():
+            event = self.events[i]
+            self.active_incidents.setdefault(event.incident_id, event)
     
     def _update_country_history(self):
         """Update country history from events"""
-        self.country_history = {}
-        for event in self.events:
-            if event.countryCode not in self.country_history:
-                self.country_history[event.countryCode] = []
-            self.country_history[event.countryCode].append(event)
+        country_codes, country_rows = np.unique(self.event_columns["countryCode"], return_inverse=True)
+        self.country_history = {
+            code: [self.events[i] for i in np.flatnonzero(country_rows == k).tolist()]
+            for k, code in enumerate(country_codes.tolist())
+        }
+    
+    def _update_sorted_events(self):
+        """Sort events newest first once, overall and per severity"""
+        # Stable argsort on the negated epochs keeps generation order among equal timestamps
+        order = self.newest_order = np.argsort(-self.event_columns["ts_epoch"], kind='stable')
+        self.sorted_events = [self.events[i] for i in order.tolist()]
+        severities = self.event_columns["severity"][order]
+        self.sorted_events_by_severity = {
+            severity: [self.events[i] for i in order[severities == severity].tolist()]
+            for severity in np.unique(severities).tolist()
+        }
+    
+    def _update_stream_frames(self):
+        """Encode every event as an SSE frame once, with its offset from the first event"""
+        self.stream_frames = [SSE_DATA_PREFIX + orjson.dumps(event) + SSE_FRAME_SUFFIX for event in self.events]
+        epochs = self.event_columns["ts_epoch"]
+        self.stream_offsets = (epochs - epochs[0]).tolist() if len(epochs) else []
     
-    def _generate_fresh_events(self, count: int = 5) -> List[CICEvent]:
+    def _fresh_severity_weights(self) -> Dict[str, float]:
+        """Weighted severity based on scenario"""
+        if self.current_scenario == "benign":
+            return {"OK": 0.8, "WARN": 0.15, "ALERT": 0.05}
+        elif self.current_scenario == "ddos":
+            return {"OK": 0.1, "WARN": 0.2, "ALERT": 0.7}
+        else:  # mixed
+            return {"OK": 0.5, "WARN": 0.3, "ALERT": 0.2}
+    
+    def _generate_fresh_events(self, count: int = 5) -> List[ReplayEvent]:
         """Generate fresh events with current timestamps"""
-        countries = [
-            {"name": "United States", "code": "US"},
-            {"name": "China", "code": "CN"},
-            {"name": "Russia", "code": "RU"},
-            {"name": "Germany", "code": "DE"},
-            {"name": "United Kingdom", "code": "GB"},
-            {"name": "France", "code": "FR"},
-            {"name": "Japan", "code": "JP"},
-            {"name": "South Korea", "code": "KR"},
-            {"name": "India", "code": "IN"},
-            {"name": "Brazil", "code": "BR"},
-            {"name": "Canada", "code": "CA"},
-            {"name": "Australia", "code": "AU"},
-            {"name": "Netherlands", "code": "NL"},
-            {"name": "Singapore", "code": "SG"},
-            {"name": "Israel", "code": "IL"},
-            {"name": "Ukraine", "code": "UA"}
-        ]
-        
-        fresh_events = []
+        severity_weights = self._fresh_severity_weights()
+        severities = random.choices(
+            list(severity_weights.keys()),
+            weights=list(severity_weights.values()),
+            k=count
+        )
         now = datetime.now()
+        return [self._generate_fresh_event(severity, now) for severity in severities]
+    
+    def _generate_fresh_event(self, severity: str, now: Optional[datetime] = None) -> ReplayEvent:
+        """Generate one fresh event of the given severity with a timestamp from the last few minutes"""
+        if now is None:
+            now = datetime.now()
         
-        # Generate events with timestamps from the last few minutes
-        for i in range(count):
-            country = random.choice(countries)
-            # Random timestamp within the last 2 minutes for more dynamic updates
-            minutes_ago = random.randint(0, 2)
-            seconds_ago = random.randint(0, 59)
-            timestamp = now - timedelta(minutes=minutes_ago, seconds=seconds_ago)
-            
-            # Ensure timestamp is properly formatted with timezone
-            timestamp_str = timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-            
-            # Weighted severity based on scenario
-            if self.current_scenario == "benign":
-                severity_weights = {"OK": 0.8, "WARN": 0.15, "ALERT": 0.05}
-            elif self.current_scenario == "ddos":
-                severity_weights = {"OK": 0.1, "WARN": 0.2, "ALERT": 0.7}
-            else:  # mixed
-                severity_weights = {"OK": 0.5, "WARN": 0.3, "ALERT": 0.2}
-            
-            severity = random.choices(
-                list(severity_weights.keys()),
-                weights=list(severity_weights.values())
-            )[0]
-            
-            # Generate appropriate reason based on severity
-            if severity == "OK":
-                reasons = [
-                    "Normal traffic pattern detected",
-                    "Regular network activity",
-                    "Standard communication flow",
-                    "Baseline traffic observed"
-                ]
-                changes = [
-                    "No significant changes",
-                    "Traffic within normal parameters",
-                    "Standard operational status"
-                ]
-                next_steps = [
-                    "Continue monitoring",
-                    "Maintain current security posture",
-                    "No action required"
-                ]
-            elif severity == "WARN":
-                reasons = [
-                    "Unusual traffic pattern detected",
-                    "Traffic volume spike observed",
-                    "Suspicious network behavior",
-                    "Anomalous connection pattern"
-                ]
-                changes = [
-                    "Traffic volume increased by 150%",
-                    "Unusual connection frequency",
-                    "Network behavior deviation detected"
-                ]
-                next_steps = [
-                    "Investigate further",
-                    "Monitor closely",
-                    "Review security logs"
-                ]
-            else:  # ALERT
-                reasons = [
-                    "Potential cyber attack detected",
-                    "Critical security breach detected",
-                    "APT infiltration attempt",
-                    "Malicious activity identified"
-                ]
-                changes = [
-                    "Critical security event",
-                    "Unauthorized access attempt",
-                    "Suspicious data exfiltration"
-                ]
-                next_steps = [
-                    "Immediate response required",
-                    "Activate incident response",
-                    "Block suspicious IPs"
-                ]
-            
-            event = CICEvent(
-                ts=timestamp_str,
-                incident_id=f"INC-{self.current_scenario.upper()}-{random.randint(1000, 9999)}",
-                severity=severity,
-                country=country["name"],
-                countryCode=country["code"],
-                ip=f"{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}.{random.randint(1,255)}",
-                reason=random.choice(reasons),
-                change=random.choice(changes),
-                status="monitoring" if severity == "OK" else "investigating",
-                next_step=random.choice(next_steps)
-            )
-            fresh_events.append(event)
+        country_name, country_code = random.choice(MIXED_COUNTRIES)
+        # Random timestamp within the last 2 minutes for more dynamic updates
+        minutes_ago = random.randint(0, 2)
+        seconds_ago = random.randint(0, 59)
+        timestamp = now - timedelta(minutes=minutes_ago, seconds=seconds_ago)
+        
+        # Ensure timestamp is properly formatted with timezone
+        timestamp_str = timestamp.isoformat(timespec='milliseconds') + 'Z'
         
-        return fresh_events
+        return ReplayEvent(
+            ts=timestamp_str,
+            incident_id=f"INC-{self.current_scenario.upper()}-{random.randint(1000, 9999)}",
+            severity=severity,
+            country=country_name,
+            countryCode=country_code,
+            ip=random.choice(_IP_POOL),
+            reason=random.choice(FRESH_REASONS[severity]),
+            change=random.choice(FRESH_CHANGES[severity]),
+            status="monitoring" if severity == "OK" else "investigating",
+            next_step=random.choice(FRESH_NEXT_STEPS[severity])
+        )
 
-    def get_events(self, window: str = "15m", severity: Optional[str] = None, limit: int = 10, offset: int = 0) -> List[CICEvent]:
+    def get_events(self, window: str = "15m", severity: Optional[str] = None, limit: int = 10, offset: int = 0) -> List[ReplayEvent]:
         """Get events with pagination"""
-        # Filter events by severity if specified
-        filtered_events = self.events.copy()
+        # Events pre-sorted by timestamp (newest first), filtered by severity if specified
         if severity:
-            filtered_events = [e for e in filtered_events if e.severity == severity]
-        
-        # Sort by timestamp (newest first)
-        filtered_events.sort(key=lambda x: x.ts, reverse=True)
+            sorted_events = self.sorted_events_by_severity.get(severity, [])
+        else:
+            sorted_events = self.sorted_events
         
         # Apply pagination
-        paginated_events = filtered_events[offset:offset + limit]
-        
-        return paginated_events
+        return sorted_events[offset:offset + limit]
     
-    async def stream_single_event(self, severity_filter: Optional[str] = None) -> Optional[CICEvent]:
+    async def stream_single_event(self, severity_filter: Optional[str] = None) -> Optional[ReplayEvent]:
         """Stream a single event with real-time timestamp"""
-        # Generate a fresh event instead of using event_streamer
-        fresh_events = self._generate_fresh_events(1)
+        # Generate a fresh event instead of using event_streamer, directly in the
+        # requested severity when one is given
+        if severity_filter in self._fresh_severity_weights():
+            return self._generate_fresh_event(severity_filter)
         
-        if not fresh_events:
-            return None
-        
-        # Filter by severity if specified
-        event = fresh_events[0]
-        if severity_filter and event.severity != severity_filter:
-            # Try to generate an event with the requested severity
-            for _ in range(10):  # Try up to 10 times
-                fresh_events = self._generate_fresh_events(1)
-                if fresh_events[0].severity == severity_filter:
-                    event = fresh_events[0]
-                    break
-        
-        return event
+        fresh_events = self._generate_fresh_events(1)
+        return fresh_events[0] if fresh_events else None
     
     def get_total_events_count(self, severity_filter: Optional[str] = None) -> int:
         """Get total count of events"""
         if severity_filter:
-            return len([e for e in self.events if e.severity == severity_filter])
+            return len(self.sorted_events_by_severity.get(severity_filter, []))
         return len(self.events)
     
     def get_stats(self, window: str = "15m") -> CICStats:
         """Get statistics for time window"""
-        events = self.get_events(window)
+        return self.stats
+    
+    def _update_stats(self):
+        """Compute the stats once per scenario; they cover the newest page of events"""
+        newest = self.newest_order[:STATS_EVENT_LIMIT]
+        severities = self.event_columns["severity"][newest]
         
-        alerts = sum(1 for e in events if e.severity == "ALERT")
-        warns = sum(1 for e in events if e.severity == "WARN")
-        oks = sum(1 for e in events if e.severity == "OK")
+        severity_counts = Counter(severities.tolist())
         
         # Count unique incident IDs for active incidents
-        incident_ids = set(e.incident_id for e in events if e.severity in ["WARN", "ALERT"])
-        active_incidents = len(incident_ids)
+        active_incidents = len(np.unique(self.event_columns["incident_id"][newest][severities != "OK"]))
         
         # Count unique countries seen in window
-        countries_seen = set(e.countryCode for e in events)
-        online = len(countries_seen)
+        online = len(np.unique(self.event_columns["countryCode"][newest]))
         
         # Total countries (from all data)
         total_countries = len(self.country_history)
         
-        return CICStats(
-            alerts=alerts,
-            warns=warns,
-            oks=oks,
+        self.stats = CICStats.model_construct(
+            alerts=severity_counts["ALERT"],
+            warns=severity_counts["WARN"],
+            oks=severity_counts["OK"],
             activeIncidents=active_incidents,
             online=online,
             totalCountries=total_countries
         )
+        self.stats_body = orjson.dumps(self.stats.model_dump())
     
-    def set_scenario(self, scenario_name: str):
-        """Switch to different scenario"""
-        if scenario_name not in self.sample_data:
+    async def set_scenario(self, scenario_name: str):
+        """Switch to different scenario, generating its events in a worker thread on first use"""
+        if scenario_name not in self.scenario_generators:
             raise ValueError(f"Unknown scenario: {scenario_name}")
         
+        await asyncio.to_thread(self._get_scenario, scenario_name)
         self.current_scenario = scenario_name
         self._load_scenario_data()
     
-    async def stream_events(self) -> AsyncGenerator[str, None]:
+    async def warm_up(self):
+        """Load the current scenario and pre-generate the others so switching never waits"""
+        await self.set_scenario(self.current_scenario)
+        for scenario_name in self.scenario_generators:
+            await asyncio.to_thread(self._get_scenario, scenario_name)
+    
+    async def stream_events(self) -> AsyncGenerator[bytes, None]:
         """Stream events in real-time"""
         self.is_streaming = True
+        stop_event = asyncio.Event()
+        self.stop_events.append(stop_event)
         
         try:
-            # Start from the beginning of the scenario data
-            start_time = datetime.now()
-            base_time = datetime.fromisoformat(self.events[0].ts.replace('Z', '+00:00'))
+            # Start from the beginning of the scenario data, on the loop's monotonic clock
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+            frames, offsets = self.stream_frames, self.stream_offsets
+            i = 0
             
-            for event in self.events:
-                if not self.is_streaming:
-                    break
-                
-                # Calculate when this event should be sent
-                event_time = datetime.fromisoformat(event.ts.replace('Z', '+00:00'))
-                time_diff = (event_time - base_time).total_seconds()
-                send_time = start_time + timedelta(seconds=time_diff / self.replay_speed)
+            while i < len(frames) and not stop_event.is_set():
+                # Wait until it's time to send the next event, or until the stream is stopped
+                delay = start_time + offsets[i] / self.replay_speed - loop.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), delay)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
                 
-                # Wait until it's time to send this event
-                now = datetime.now()
-                if send_time > now:
-                    await asyncio.sleep((send_time - now).total_seconds())
-                
-                # Send the event
-                yield f"data: {event.json()}\n\n"
+                # Send every event due within this tick in a single chunk
+                tick_end = (loop.time() - start_time + STREAM_TICK_SECONDS) * self.replay_speed
+                end = i + 1
+                while end < len(frames) and offsets[end] <= tick_end:
+                    end += 1
+                yield frames[i] if end == i + 1 else b"".join(frames[i:end])
+                i = end
                 
         finally:
-            self.is_streaming = False
+            self.stop_events.remove(stop_event)
+            self.is_streaming = bool(self.stop_events)
     
     def stop_streaming(self):
         """Stop the event stream"""
         self.is_streaming = False
+        for stop_event in self.stop_events:
+            stop_event.set()
 
 # Global replayer instance
 replayer = CICReplayer()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Generate the replayer scenarios at startup instead of at import time"""
+    await replayer.warm_up()
+    yield
+
+# Encoded /events responses, valid for events_cache_version only
+events_cache: Dict[tuple, bytes] = {}
+events_cache_version = 0
+
 # FastAPI app for the replayer
 app = FastAPI(
     title="CIC-DDoS2019 Event Replayer",
     description="Streams pre-baked CIC-DDoS2019 JSONL events with configurable scenarios",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 @app.get("/")
@@ -536,18 +666,27 @@ async def get_events(
     offset: int = Query(0, description="Number of events to skip")
 ):
     """Get recent events with pagination"""
+    global events_cache_version
     try:
-        events = replayer.get_events(window, severity, limit, offset)
-        total_count = replayer.get_total_events_count(severity)
-        return {
-            "events": events, 
-            "count": len(events), 
-            "total_count": total_count,
-            "limit": limit,
-            "offset": offset,
-            "has_more": offset + len(events) < total_count,
-            "window": window
-        }
+        # Pages only change when the scenario is reloaded, so polls are served from the cache
+        if events_cache_version != replayer.scenario_version or len(events_cache) >= EVENTS_CACHE_SIZE:
+            events_cache.clear()
+            events_cache_version = replayer.scenario_version
+        cache_key = (window, severity, limit, offset)
+        body = events_cache.get(cache_key)
+        if body is None:
+            events = replayer.get_events(window, severity, limit, offset)
+            total_count = replayer.get_total_events_count(severity)
+            body = events_cache[cache_key] = orjson.dumps({
+                "events": events, 
+                "count": len(events), 
+                "total_count": total_count,
+                "limit": limit,
+                "offset": offset,
+                "has_more": offset + len(events) < total_count,
+                "window": window
+            })
+        return Response(body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -559,16 +698,17 @@ async def stream_single_event(
     try:
         event = await replayer.stream_single_event(severity)
         if event:
-            return {
+            body = orjson.dumps({
                 "event": event,
                 "streamed_at": datetime.now().isoformat() + "Z"
-            }
+            })
         else:
-            return {
+            body = orjson.dumps({
                 "event": None,
                 "message": "No events available to stream",
                 "streamed_at": datetime.now().isoformat() + "Z"
-            }
+            })
+        return Response(body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -576,8 +716,8 @@ async def stream_single_event(
 async def get_stats(window: str = Query("15m", description="Time window: 5m, 15m, 60m, etc.")):
     """Get statistics for time window"""
     try:
-        stats = replayer.get_stats(window)
-        return stats
+        # Stats are encoded once per scenario load
+        return Response(replayer.stats_body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -599,7 +739,7 @@ async def stream_events():
 async def set_scenario(scenario: ScenarioRequest):
     """Switch to different scenario"""
     try:
-        replayer.set_scenario(scenario.name)
+        await replayer.set_scenario(scenario.name)
         return {
             "message": f"Switched to {scenario.name} scenario",
             "scenario": scenario.name,
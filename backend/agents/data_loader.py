@@ -3,12 +3,124 @@ Real Traffic Data Loader
 Loads preprocessed CIC DDoS 2019 data and provides streaming interface
 Supports both batch loading and real-time simulation
 """
-import json
+import os
 import random
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Iterator
+from typing import Dict, List, Optional, Iterator, Tuple
 from datetime import datetime
+from itertools import chain, islice
 import glob
+import ijson
+import numpy as np
+
+from agents.batch_processor import load_dataset as load_cached_dataset
+
+# Datasets above this size are streamed with ijson instead of parsed whole
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Node types whose edges are prioritized when sampling a traffic batch
+INFRASTRUCTURE_NODE_TYPES = frozenset({"server", "router", "firewall", "load_balancer", "database"})
+
+# Connection types counted in batch statistics, in uint8 code order
+CONNECTION_TYPES = ("normal", "suspicious", "attack")
+CONNECTION_CODES = {name: code for code, name in enumerate(CONNECTION_TYPES)}
+
+# Random source for batch sampling
+_rng = np.random.default_rng()
+
+
+@dataclass
+class _DatasetArrays:
+    """
+    Struct-of-arrays view of a processed dataset for batch sampling.
+    Edge endpoints are node row indices; a missing node maps to -1, which
+    lands on the trailing sentinel row of every node array.
+    """
+    node_id_to_idx: Dict[str, int]
+    node_type_code: np.ndarray
+    node_traffic_volume: np.ndarray
+    infra_mask: np.ndarray
+    edge_src_idx: np.ndarray
+    edge_dst_idx: np.ndarray
+    edge_conn_type: np.ndarray
+    priority_edge_idx: np.ndarray = field(init=False, repr=False)
+    regular_edge_idx: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # The dataset is immutable while cached, so classify edges once for every batch
+        priority_mask = self.priority_mask()
+        self.priority_edge_idx = np.flatnonzero(priority_mask)
+        self.regular_edge_idx = np.flatnonzero(~priority_mask)
+
+    @classmethod
+    def from_dataset(cls, dataset: Dict) -> "_DatasetArrays":
+        nodes = dataset.get("nodes", [])
+        edges = dataset.get("edges", [])
+        node_id_to_idx = {node["id"]: idx for idx, node in enumerate(nodes)}
+        type_codes: Dict[str, int] = {"client": 0}
+        node_count = len(nodes)
+        edge_count = len(edges)
+
+        node_type_code = np.zeros(node_count + 1, dtype=np.uint8)
+        node_type_code[:node_count] = np.fromiter(
+            (type_codes.setdefault(node.get("node_type", "client"), len(type_codes)) for node in nodes),
+            dtype=np.uint8, count=node_count
+        )
+        node_traffic_volume = np.zeros(node_count + 1, dtype=np.int64)
+        node_traffic_volume[:node_count] = np.fromiter(
+            (node.get("traffic_volume", 0) for node in nodes), dtype=np.int64, count=node_count
+        )
+
+        return cls(
+            node_id_to_idx=node_id_to_idx,
+            node_type_code=node_type_code,
+            node_traffic_volume=node_traffic_volume,
+            infra_mask=np.fromiter(
+                (node_type in INFRASTRUCTURE_NODE_TYPES for node_type in type_codes),
+                dtype=bool, count=len(type_codes)
+            ),
+            edge_src_idx=np.fromiter(
+                (node_id_to_idx.get(edge["source_id"], -1) for edge in edges), dtype=np.int32, count=edge_count
+            ),
+            edge_dst_idx=np.fromiter(
+                (node_id_to_idx.get(edge["target_id"], -1) for edge in edges), dtype=np.int32, count=edge_count
+            ),
+            edge_conn_type=np.fromiter(
+                (CONNECTION_CODES.get(edge.get("connection_type"), len(CONNECTION_TYPES)) for edge in edges),
+                dtype=np.uint8, count=edge_count
+            )
+        )
+
+    def priority_mask(self) -> np.ndarray:
+        """Edges touching infrastructure nodes, via a gather on the node type LUT"""
+        return (self.infra_mask[self.node_type_code[self.edge_src_idx]]
+                | self.infra_mask[self.node_type_code[self.edge_dst_idx]])
+
+    def batch_node_idx(self, edge_idx: np.ndarray) -> np.ndarray:
+        """Sorted, distinct node rows referenced by the given edges"""
+        node_idx = np.unique(np.concatenate([self.edge_src_idx[edge_idx], self.edge_dst_idx[edge_idx]]))
+        return node_idx[node_idx >= 0]
+
+    def connection_counts(self, edge_idx: np.ndarray) -> np.ndarray:
+        """Per-connection-type edge counts, in CONNECTION_TYPES order"""
+        return np.bincount(self.edge_conn_type[edge_idx], minlength=len(CONNECTION_TYPES) + 1)
+
+
+@lru_cache(maxsize=32)
+def _dataset_arrays(file_path: str, mtime: float) -> _DatasetArrays:
+    """Columnar view of a cached dataset, built once per (path, mtime)"""
+    return _DatasetArrays.from_dataset(load_cached_dataset(file_path))
+
+
+@lru_cache(maxsize=32)
+def _dataset_attack_types(file_path: str, mtime: float) -> frozenset:
+    """Attack types listed in a dataset's statistics, read once per (path, mtime)"""
+    # Only the statistics.attack_types keys are read; nodes and edges are skipped, not built
+    with open(file_path, 'rb') as f:
+        return frozenset(key for key, _ in ijson.kvitems(f, 'statistics.attack_types'))
 
 
 class RealTrafficDataLoader:
@@ -53,16 +165,8 @@ class RealTrafficDataLoader:
         """Check if real CIC DDoS data is available"""
         return self.mode == "real" and len(self.available_datasets) > 0
 
-    def load_dataset(self, dataset_name: Optional[str] = None) -> Optional[Dict]:
-        """
-        Load a specific dataset or select one randomly
-
-        Args:
-            dataset_name: Optional specific dataset filename
-
-        Returns:
-            Dictionary with network data or None if not found
-        """
+    def _resolve_dataset_path(self, dataset_name: Optional[str] = None) -> Optional[Path]:
+        """Path of a specific dataset, or of a random one when no name is given"""
         if not self.is_real_data_available():
             return None
 
@@ -79,11 +183,30 @@ class RealTrafficDataLoader:
             # Select random dataset
             dataset_path = random.choice(self.available_datasets)
 
+        return dataset_path
+
+    def load_dataset(self, dataset_name: Optional[str] = None) -> Optional[Dict]:
+        """
+        Load a specific dataset or select one randomly
+
+        Args:
+            dataset_name: Optional specific dataset filename
+
+        Returns:
+            Dictionary with network data or None if not found. The dictionary is
+            cached per (path, mtime) and shared with the batch processor, so it
+            must not be mutated.
+        """
+        dataset_path = self._resolve_dataset_path(dataset_name)
+        if dataset_path is None:
+            return None
+
+        return self._read_dataset(dataset_path)
+
+    def _read_dataset(self, dataset_path: Path) -> Optional[Dict]:
+        """Parse a processed dataset file, reusing the cached parse while the file is unchanged"""
         try:
-            with open(dataset_path, 'r') as f:
-                data = json.load(f)
-                print(f"Loaded dataset: {dataset_path.name}")
-                return data
+            return load_cached_dataset(str(dataset_path))
         except Exception as e:
             print(f"Error loading dataset {dataset_path}: {e}")
             return None
@@ -99,7 +222,8 @@ class RealTrafficDataLoader:
         Returns:
             Dictionary with nodes, edges, and statistics
         """
-        dataset = self.load_dataset(dataset_name)
+        dataset_path = self._resolve_dataset_path(dataset_name)
+        dataset = self._read_dataset(dataset_path) if dataset_path is not None else None
 
         if not dataset:
             # Return empty structure if no data
@@ -120,64 +244,37 @@ class RealTrafficDataLoader:
                 }
             }
 
-        # Sample a batch from the dataset
         all_edges = dataset.get("edges", [])
         all_nodes = dataset.get("nodes", [])
-
-        # Strategy: Ensure diverse node types by including edges with different node types
-        # Group nodes by type
-        nodes_by_type = {}
-        for node in all_nodes:
-            node_type = node.get("node_type", "client")
-            if node_type not in nodes_by_type:
-                nodes_by_type[node_type] = []
-            nodes_by_type[node_type].append(node)
+        arrays = _dataset_arrays(str(dataset_path), os.path.getmtime(dataset_path))
 
         # Sample edges, but ensure we get edges involving servers/routers
-        sampled_edges = []
         if len(all_edges) > batch_size:
             # First, prioritize edges involving servers, routers, and other infrastructure
-            priority_edges = []
-            regular_edges = []
-
-            # Build node type lookup
-            node_type_lookup = {node["id"]: node.get("node_type", "client") for node in all_nodes}
-
-            for edge in all_edges:
-                src_type = node_type_lookup.get(edge["source_id"], "client")
-                dst_type = node_type_lookup.get(edge["target_id"], "client")
-
-                # Prioritize edges with servers, routers, firewalls
-                if src_type in ["server", "router", "firewall", "load_balancer", "database"] or \
-                   dst_type in ["server", "router", "firewall", "load_balancer", "database"]:
-                    priority_edges.append(edge)
-                else:
-                    regular_edges.append(edge)
+            priority_idx = arrays.priority_edge_idx
+            regular_idx = arrays.regular_edge_idx
 
             # Sample: 60% priority edges, 40% regular edges to show diverse topology
-            priority_count = min(len(priority_edges), int(batch_size * 0.6))
-            regular_count = batch_size - priority_count
-
-            if priority_edges:
-                sampled_edges.extend(random.sample(priority_edges, min(priority_count, len(priority_edges))))
-            if regular_edges and regular_count > 0:
-                sampled_edges.extend(random.sample(regular_edges, min(regular_count, len(regular_edges))))
+            priority_count = min(len(priority_idx), int(batch_size * 0.6))
+            regular_count = min(batch_size - priority_count, len(regular_idx))
+
+            # Sample edge indices and only then pick the edges
+            sampled_idx = np.concatenate([
+                _rng.choice(priority_idx, priority_count, replace=False),
+                _rng.choice(regular_idx, regular_count, replace=False)
+            ])
+            sampled_edges = [all_edges[i] for i in sampled_idx.tolist()]
         else:
+            sampled_idx = np.arange(len(all_edges))
             sampled_edges = all_edges
 
         # Get all nodes referenced by sampled edges
-        edge_node_ids = set()
-        for edge in sampled_edges:
-            edge_node_ids.add(edge["source_id"])
-            edge_node_ids.add(edge["target_id"])
-
-        sampled_nodes = [node for node in all_nodes if node["id"] in edge_node_ids]
+        node_idx = arrays.batch_node_idx(sampled_idx)
+        sampled_nodes = [all_nodes[i] for i in node_idx.tolist()]
 
         # Calculate batch statistics
-        total_traffic = sum(node.get("traffic_volume", 0) for node in sampled_nodes)
-        attack_count = len([e for e in sampled_edges if e.get("connection_type") == "attack"])
-        suspicious_count = len([e for e in sampled_edges if e.get("connection_type") == "suspicious"])
-        normal_count = len([e for e in sampled_edges if e.get("connection_type") == "normal"])
+        total_traffic = int(arrays.node_traffic_volume[node_idx].sum())
+        connection_counts = dict(zip(CONNECTION_TYPES, arrays.connection_counts(sampled_idx).tolist()))
 
         return {
             "nodes": sampled_nodes,
@@ -186,9 +283,9 @@ class RealTrafficDataLoader:
                 "total_nodes": len(sampled_nodes),
                 "total_edges": len(sampled_edges),
                 "total_traffic": total_traffic,
-                "attack_count": attack_count,
-                "suspicious_count": suspicious_count,
-                "normal_count": normal_count
+                "attack_count": connection_counts["attack"],
+                "suspicious_count": connection_counts["suspicious"],
+                "normal_count": connection_counts["normal"]
             },
             "metadata": {
                 "source": "CIC-DDoS-2019",
@@ -211,34 +308,38 @@ class RealTrafficDataLoader:
         Yields:
             Traffic batch dictionaries
         """
-        dataset = self.load_dataset(dataset_name)
-
-        if not dataset:
+        dataset_path = self._resolve_dataset_path(dataset_name)
+        if dataset_path is None:
             return
 
-        all_edges = dataset.get("edges", [])
-        all_nodes = dataset.get("nodes", [])
+        if dataset_path.stat().st_size > STREAMING_THRESHOLD_BYTES:
+            # Large dataset: only the node lookup and one batch of edges are held at a time
+            node_lookup, total_edges, edge_batches = self._stream_dataset_edges(dataset_path, batch_size)
+        else:
+            dataset = self._read_dataset(dataset_path)
+
+            if not dataset:
+                return
 
-        # Create node lookup
-        node_lookup = {node["id"]: node for node in all_nodes}
+            all_edges = dataset.get("edges", [])
+            all_nodes = dataset.get("nodes", [])
+
+            # Create node lookup
+            node_lookup = {node["id"]: node for node in all_nodes}
+            total_edges = len(all_edges)
+            edge_batches = (all_edges[i:i + batch_size] for i in range(0, total_edges, batch_size))
 
         # Stream edges in batches
-        for i in range(0, len(all_edges), batch_size):
-            batch_edges = all_edges[i:i + batch_size]
+        for batch_number, batch_edges in enumerate(edge_batches):
 
             # Get nodes for this batch
-            edge_node_ids = set()
-            for edge in batch_edges:
-                edge_node_ids.add(edge["source_id"])
-                edge_node_ids.add(edge["target_id"])
+            edge_node_ids = set(chain.from_iterable((edge["source_id"], edge["target_id"]) for edge in batch_edges))
 
             batch_nodes = [node_lookup[node_id] for node_id in edge_node_ids if node_id in node_lookup]
 
             # Calculate statistics
             total_traffic = sum(node.get("traffic_volume", 0) for node in batch_nodes)
-            attack_count = len([e for e in batch_edges if e.get("connection_type") == "attack"])
-            suspicious_count = len([e for e in batch_edges if e.get("connection_type") == "suspicious"])
-            normal_count = len([e for e in batch_edges if e.get("connection_type") == "normal"])
+            connection_counts = Counter(e.get("connection_type") for e in batch_edges)
 
             yield {
                 "nodes": batch_nodes,
@@ -247,18 +348,47 @@ class RealTrafficDataLoader:
                     "total_nodes": len(batch_nodes),
                     "total_edges": len(batch_edges),
                     "total_traffic": total_traffic,
-                    "attack_count": attack_count,
-                    "suspicious_count": suspicious_count,
-                    "normal_count": normal_count
+                    "attack_count": connection_counts["attack"],
+                    "suspicious_count": connection_counts["suspicious"],
+                    "normal_count": connection_counts["normal"]
                 },
                 "metadata": {
                     "source": "CIC-DDoS-2019",
                     "timestamp": datetime.now().isoformat(),
-                    "batch_number": i // batch_size,
-                    "total_batches": (len(all_edges) + batch_size - 1) // batch_size
+                    "batch_number": batch_number,
+                    "total_batches": (total_edges + batch_size - 1) // batch_size
                 }
             }
 
+    def _stream_dataset_edges(self, dataset_path: Path, batch_size: int) -> Tuple[Dict[str, Dict], int, Iterator[List[Dict]]]:
+        """
+        Incrementally parse a processed dataset for streaming
+
+        Returns:
+            Node lookup, total edge count and a generator of edge batches
+            that reads the edges array while batches are consumed
+        """
+        with open(dataset_path, 'rb') as f:
+            total_edges = next(ijson.items(f, 'statistics.total_edges'), None)
+        if total_edges is None:
+            with open(dataset_path, 'rb') as f:
+                total_edges = sum(1 for _ in ijson.items(f, 'edges.item'))
+
+        with open(dataset_path, 'rb') as f:
+            node_lookup = {node["id"]: node for node in ijson.items(f, 'nodes.item', use_float=True)}
+        print(f"Streaming dataset: {dataset_path.name}")
+
+        def edge_batches() -> Iterator[List[Dict]]:
+            with open(dataset_path, 'rb') as f:
+                edges = ijson.items(f, 'edges.item', use_float=True)
+                while True:
+                    batch = list(islice(edges, batch_size))
+                    if not batch:
+                        return
+                    yield batch
+
+        return node_lookup, total_edges, edge_batches()
+
     def get_dataset_info(self) -> Dict:
         """Get information about available datasets"""
         return {
@@ -274,11 +404,7 @@ class RealTrafficDataLoader:
 
         for dataset_file in self.available_datasets:
             try:
-                with open(dataset_file, 'r') as f:
-                    data = json.load(f)
-                    stats = data.get("statistics", {})
-                    attack_type_dist = stats.get("attack_types", {})
-                    attack_types.update(attack_type_dist.keys())
+                attack_types.update(_dataset_attack_types(str(dataset_file), os.path.getmtime(dataset_file)))
             except Exception as e:
                 print(f"Error reading {dataset_file}: {e}")
 
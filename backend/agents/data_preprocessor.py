@@ -3,10 +3,16 @@ CIC DDoS 2019 Data Preprocessor
 Loads, cleans, and transforms raw CSV files into usable format
 Maps dataset features to network graph representation
 """
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
-import json
+from typing import Iterable, List, Dict, Tuple, Optional
+import orjson
 from datetime import datetime
 
 # Try absolute import first (when run as module), fall back to relative
@@ -16,6 +22,15 @@ except ImportError:
     from geoip_service import geoip_service
 
 
+# Endpoint statuses by increasing severity
+NODE_STATUSES = ("normal", "suspicious", "attacked")
+
+
+def _interned(values: List[str]) -> List[str]:
+    """Share one string object per distinct value of a categorical column"""
+    return list(map(sys.intern, values))
+
+
 class CICDDoSPreprocessor:
     """
     Preprocessor for CIC DDoS 2019 dataset
@@ -46,6 +61,19 @@ class CICDDoSPreprocessor:
         "PortScan": "Port-Scan"
     }
 
+    # Flow columns read by process_dataframe; the rest of the ~80 CIC features are never loaded
+    FLOW_COLUMNS = frozenset({
+        "Source IP", "Destination IP", "Source Port", "Destination Port", "Protocol",
+        "Total Fwd Packets", "Total Backward Packets", "Total Length of Fwd Packets",
+        "Total Length of Bwd Packets", "Flow Duration", "Fwd IAT Mean", "Label"
+    })
+
+    # Endpoint columns, the only ones needed to geolocate a file's flows
+    IP_COLUMNS = frozenset({"Source IP", "Destination IP"})
+
+    # Low-cardinality flow columns stored as pandas categories
+    CATEGORY_COLUMNS = frozenset({"protocol", "label"})
+
     # Node type inference from ports
     SERVER_PORTS = {80, 443, 22, 21, 25, 53, 110, 143, 3306, 5432, 8080, 8443, 123, 389, 1434, 161, 1900, 69}
     DATABASE_PORTS = {3306, 5432, 1433, 1434, 27017, 6379, 5984}  # MySQL, PostgreSQL, MSSQL, MongoDB, Redis, CouchDB
@@ -66,13 +94,20 @@ class CICDDoSPreprocessor:
         parquet_files = list(self.raw_data_dir.rglob("*.parquet"))
         return csv_files + parquet_files
 
-    def load_data_file(self, filepath: Path, nrows: Optional[int] = None) -> pd.DataFrame:
+    def flow_usecols(self, columns, wanted: Optional[frozenset] = None) -> List[str]:
+        """Actual header names of the needed flow columns (FLOW_COLUMNS by default), whatever their case or surrounding whitespace"""
+        needed = {name.lower() for name in (wanted or self.FLOW_COLUMNS)}
+        return [col for col in columns if str(col).strip().lower() in needed]
+
+    def load_data_file(self, filepath: Path, nrows: Optional[int] = None,
+                       columns: Optional[frozenset] = None) -> pd.DataFrame:
         """
         Load a single CSV or Parquet file with error handling
 
         Args:
             filepath: Path to CSV or Parquet file
             nrows: Optional limit on number of rows to load
+            columns: Optional subset of FLOW_COLUMNS to load instead of all of them
 
         Returns:
             DataFrame with loaded data
@@ -82,8 +117,8 @@ class CICDDoSPreprocessor:
         try:
             # Detect file type and load accordingly
             if filepath.suffix.lower() == '.parquet':
-                # Load Parquet file
-                df = pd.read_parquet(filepath)
+                # Load Parquet file, projecting the needed columns from its schema
+                df = pd.read_parquet(filepath, columns=self.flow_usecols(pq.read_schema(filepath).names, columns))
 
                 # Apply row limit if specified
                 if nrows is not None:
@@ -95,15 +130,26 @@ class CICDDoSPreprocessor:
                         df[col] = df[col].astype(str)
             else:
                 # Load CSV file
-                # CIC DDoS CSVs may have inconsistent whitespace in headers
-                df = pd.read_csv(filepath, nrows=nrows, low_memory=False)
+                # CIC DDoS CSVs may have inconsistent whitespace in headers, so resolve them first
+                usecols = self.flow_usecols(pd.read_csv(filepath, nrows=0).columns, columns)
+                if nrows is None:
+                    # The multithreaded Arrow reader has no row limit, so only use it for whole files
+                    df = pd.read_csv(filepath, usecols=usecols, engine='pyarrow')
+                else:
+                    df = pd.read_csv(filepath, usecols=usecols, nrows=nrows, low_memory=False)
 
             # Clean column names (remove leading/trailing spaces)
             df.columns = df.columns.str.strip()
 
-            # Handle infinity and NaN values
-            df.replace([float('inf'), float('-inf')], 0, inplace=True)
-            df.fillna(0, inplace=True)
+            # Handle infinity and NaN values: one NumPy pass over the float columns,
+            # while the remaining columns can only hold missing values
+            float_cols = df.select_dtypes(include='floating').columns
+            if len(float_cols):
+                df[float_cols] = np.nan_to_num(df[float_cols].to_numpy(), nan=0.0, posinf=0.0, neginf=0.0)
+            other_cols = df.columns.difference(float_cols, sort=False)
+            df[other_cols] = df[other_cols].fillna(0)
+
+            self.downcast_flow_columns(df)
 
             print(f"  Loaded {len(df)} rows, {len(df.columns)} columns")
             return df
@@ -112,167 +158,96 @@ class CICDDoSPreprocessor:
             print(f"  Error loading {filepath}: {e}")
             return pd.DataFrame()
 
-    def infer_node_type(self, port: int, is_source: bool) -> str:
+    def downcast_flow_columns(self, df: pd.DataFrame):
         """
-        Infer node type from port number
+        Shrink a cleaned flow DataFrame in place before graph construction
+
+        Integer columns (ports, packet counts, durations) take the smallest
+        dtype that holds their values exactly, and protocol and label become
+        categories. Float columns keep float64 so byte totals and IATs stay exact.
+        """
+        for col in df.columns:
+            series = df[col]
+            if str(col).lower() in self.CATEGORY_COLUMNS:
+                df[col] = series.astype('category')
+            elif pd.api.types.is_integer_dtype(series.dtype) and len(series):
+                df[col] = pd.to_numeric(series, downcast='unsigned' if series.min() >= 0 else 'integer')
+
+    def flow_column(self, df: pd.DataFrame, name: str, default) -> pd.Series:
+        """
+        Column `name` of a flow DataFrame, tolerating CIC's leading-space header variants
 
         Args:
-            port: Port number
-            is_source: Whether this is source or destination
+            df: DataFrame with flow data
+            name: Canonical column name (without surrounding whitespace)
+            default: Value used for every row when the column is missing
 
         Returns:
-            Node type string (server, client, router, database)
+            Series aligned with df
         """
-        # Router traffic (port 0)
-        if port == 0:
-            return "router"
-
-        # Database servers
-        elif port in self.DATABASE_PORTS:
-            return "database"
+        for col in (f" {name}", name):
+            if col in df.columns:
+                return df[col]
+        return pd.Series(default, index=df.index)
 
-        # Web/application servers
-        elif port in self.SERVER_PORTS:
-            return "server"
-
-        # Ephemeral client ports
-        elif is_source and port > 49152:
-            return "client"
-
-        # Default to client
-        else:
-            return "client"
-
-    def extract_label(self, row: pd.Series) -> str:
-        """Extract and normalize attack label from row"""
-        # Try common label column names
-        label_columns = [' Label', 'Label', ' label', 'label']
-
-        for col in label_columns:
-            if col in row:
-                raw_label = str(row[col]).strip()
-                return self.ATTACK_TYPE_MAP.get(raw_label, raw_label)
-
-        return "unknown"
-
-    def process_flow_to_nodes_edges(self, row: pd.Series, flow_id: int) -> Tuple[List[Dict], List[Dict]]:
+    def infer_node_types(self, ports: np.ndarray) -> np.ndarray:
         """
-        Convert a single flow record to nodes and edges
+        Infer node types from an array of port numbers
 
         Args:
-            row: DataFrame row with flow data
-            flow_id: Unique flow identifier
+            ports: Port numbers
 
         Returns:
-            Tuple of (nodes, edges) lists
+            Array of node type strings (server, client, router, database)
         """
-        nodes = []
-        edges = []
-
-        # Extract flow identifiers (handle variations in column naming)
-        src_ip = str(row.get(' Source IP', row.get('Source IP', '0.0.0.0'))).strip()
-        dst_ip = str(row.get(' Destination IP', row.get('Destination IP', '0.0.0.0'))).strip()
-        src_port = int(row.get(' Source Port', row.get('Source Port', 0)))
-        dst_port = int(row.get(' Destination Port', row.get('Destination Port', 0)))
-        protocol = str(row.get(' Protocol', row.get('Protocol', 'TCP'))).strip()
-
-        # Get attack label
-        label = self.extract_label(row)
-
-        # Determine connection type and status
-        if label == "normal":
-            connection_type = "normal"
-            src_status = "normal"
-            dst_status = "normal"
-        elif "Scan" in label:
-            connection_type = "suspicious"
-            src_status = "suspicious"
-            dst_status = "normal"
-        else:
-            connection_type = "attack"
-            src_status = "suspicious"  # Attacker
-            dst_status = "attacked"    # Victim
-
-        # Get geo data for IPs
-        if src_ip not in self.ip_geo_cache:
-            self.ip_geo_cache[src_ip] = geoip_service.lookup(src_ip)
-        if dst_ip not in self.ip_geo_cache:
-            self.ip_geo_cache[dst_ip] = geoip_service.lookup(dst_ip)
-
-        src_geo = self.ip_geo_cache[src_ip]
-        dst_geo = self.ip_geo_cache[dst_ip]
-
-        # Calculate traffic metrics
-        total_fwd_packets = int(row.get(' Total Fwd Packets', row.get('Total Fwd Packets', 0)))
-        total_bwd_packets = int(row.get(' Total Backward Packets', row.get('Total Backward Packets', 0)))
-        total_packets = total_fwd_packets + total_bwd_packets
-
-        fwd_bytes = int(row.get(' Total Length of Fwd Packets', row.get('Total Length of Fwd Packets', 0)))
-        bwd_bytes = int(row.get(' Total Length of Bwd Packets', row.get('Total Length of Bwd Packets', 0)))
-        total_bytes = fwd_bytes + bwd_bytes
-
-        flow_duration = float(row.get(' Flow Duration', row.get('Flow Duration', 1)))
-
-        # Calculate bandwidth (bytes per second)
-        bandwidth = int((total_bytes / (flow_duration / 1_000_000)) if flow_duration > 0 else 0)
-
-        # Calculate latency estimate from IAT (Inter-Arrival Time)
-        fwd_iat_mean = float(row.get(' Fwd IAT Mean', row.get('Fwd IAT Mean', 0)))
-        latency = fwd_iat_mean / 1000  # Convert microseconds to milliseconds
-
-        # Create source node
-        src_node = {
-            "id": f"{src_ip}:{src_port}",
-            "ip": src_ip,
-            "port": src_port,
-            "country": src_geo["country"],
-            "city": src_geo["city"],
-            "latitude": src_geo["latitude"],
-            "longitude": src_geo["longitude"],
-            "node_type": self.infer_node_type(src_port, True),
-            "status": src_status,
-            "traffic_volume": fwd_bytes,
-            "last_seen": datetime.now().isoformat()
-        }
-
-        # Create destination node
-        dst_node = {
-            "id": f"{dst_ip}:{dst_port}",
-            "ip": dst_ip,
-            "port": dst_port,
-            "country": dst_geo["country"],
-            "city": dst_geo["city"],
-            "latitude": dst_geo["latitude"],
-            "longitude": dst_geo["longitude"],
-            "node_type": self.infer_node_type(dst_port, False),
-            "status": dst_status,
-            "traffic_volume": bwd_bytes,
-            "last_seen": datetime.now().isoformat()
-        }
-
-        # Create edge
-        edge = {
-            "id": f"flow_{flow_id}",
-            "source_id": src_node["id"],
-            "target_id": dst_node["id"],
-            "connection_type": connection_type,
-            "bandwidth": bandwidth,
-            "latency": latency,
-            "packet_count": total_packets,
-            "protocol": protocol,
-            "attack_type": label if connection_type == "attack" else None,
-            "timestamp": datetime.now().isoformat()
-        }
+        return np.select(
+            [
+                ports == 0,                                  # Router traffic (port 0)
+                np.isin(ports, list(self.DATABASE_PORTS)),   # Database servers
+                np.isin(ports, list(self.SERVER_PORTS))      # Web/application servers
+            ],
+            ["router", "database", "server"],
+            default="client"                                 # Ephemeral and other client ports
+        )
+
+    def extract_labels(self, df: pd.DataFrame) -> pd.Series:
+        """Extract and normalize the attack label of every row"""
+        # Detect the label column once, whatever its case or surrounding whitespace
+        label_col = next((col for col in df.columns if str(col).strip().lower() == 'label'), None)
+        if label_col is None:
+            return pd.Series("unknown", index=df.index)
+
+        raw_labels = df[label_col].astype(str).str.strip()
+        return raw_labels.map(self.ATTACK_TYPE_MAP).fillna(raw_labels)
+
+    def flow_ips(self, df: pd.DataFrame) -> Tuple[List[str], List[str]]:
+        """Source and destination IPs of every flow, stripped of surrounding whitespace"""
+        src_ips = self.flow_column(df, 'Source IP', '0.0.0.0').astype(str).str.strip().tolist()
+        dst_ips = self.flow_column(df, 'Destination IP', '0.0.0.0').astype(str).str.strip().tolist()
+        return src_ips, dst_ips
+
+    def resolve_geo(self, ips: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up every distinct uncached IP in one batch, in first-seen order
 
-        nodes.extend([src_node, dst_node])
-        edges.append(edge)
+        Args:
+            ips: IP addresses, possibly repeated
 
-        return nodes, edges
+        Returns:
+            The preprocessor's IP -> geo cache, covering all of `ips`
+        """
+        missing = [ip for ip in dict.fromkeys(ips) if ip not in self.ip_geo_cache]
+        if missing:
+            self.ip_geo_cache.update(geoip_service.bulk_lookup(missing))
+        return self.ip_geo_cache
 
     def process_dataframe(self, df: pd.DataFrame, max_flows: Optional[int] = None) -> Dict:
         """
         Process entire dataframe into network graph format
 
+        Every flow field is computed column-wise; Python only loops to build the
+        node and edge records.
+
         Args:
             df: DataFrame with CIC DDoS flow data
             max_flows: Optional limit on flows to process
@@ -280,37 +255,106 @@ class CICDDoSPreprocessor:
         Returns:
             Dictionary with nodes, edges, and statistics
         """
-        all_nodes = {}  # Use dict to deduplicate by ID
-        all_edges = []
-
         # Limit flows if specified
         if max_flows:
             df = df.head(max_flows)
 
         print(f"Processing {len(df)} flows...")
 
-        for idx, row in df.iterrows():
-            nodes, edges = self.process_flow_to_nodes_edges(row, idx)
+        # Extract flow identifiers
+        src_ips, dst_ips = self.flow_ips(df)
+        src_ports = self.flow_column(df, 'Source Port', 0).to_numpy().astype(np.int64)
+        dst_ports = self.flow_column(df, 'Destination Port', 0).to_numpy().astype(np.int64)
+        protocols = _interned(self.flow_column(df, 'Protocol', 'TCP').astype(str).str.strip().tolist())
+
+        # Get attack labels and derive connection type and endpoint status
+        labels = self.extract_labels(df).to_numpy(dtype=object)
+        is_normal = labels == "normal"
+        is_scan = np.fromiter(("Scan" in label for label in labels), dtype=bool, count=len(labels))
+        connection_types = np.where(is_normal, "normal", np.where(is_scan, "suspicious", "attack"))
+        src_statuses = np.where(is_normal, 0, 1)            # Attacker unless benign
+        dst_statuses = np.where(is_normal | is_scan, 0, 2)  # Victim of attacks
+        attack_types = np.where(connection_types == "attack", labels, None).tolist()
 
-            # Add nodes (avoiding duplicates)
-            for node in nodes:
-                node_id = node["id"]
-                if node_id not in all_nodes:
-                    all_nodes[node_id] = node
-                else:
-                    # Aggregate traffic volume
-                    all_nodes[node_id]["traffic_volume"] += node["traffic_volume"]
-                    # Update status to most severe
-                    if node["status"] == "attacked":
-                        all_nodes[node_id]["status"] = "attacked"
-                    elif node["status"] == "suspicious" and all_nodes[node_id]["status"] != "attacked":
-                        all_nodes[node_id]["status"] = "suspicious"
+        # Calculate traffic metrics
+        total_packets = (self.flow_column(df, 'Total Fwd Packets', 0).to_numpy().astype(np.int64) +
+                         self.flow_column(df, 'Total Backward Packets', 0).to_numpy().astype(np.int64))
+        fwd_bytes = self.flow_column(df, 'Total Length of Fwd Packets', 0).to_numpy().astype(np.int64)
+        bwd_bytes = self.flow_column(df, 'Total Length of Bwd Packets', 0).to_numpy().astype(np.int64)
+        total_bytes = fwd_bytes + bwd_bytes
 
-            # Add edges
-            all_edges.extend(edges)
+        flow_duration = self.flow_column(df, 'Flow Duration', 1).to_numpy().astype(np.float64)
 
-        # Convert nodes dict to list
-        nodes_list = list(all_nodes.values())
+        # Calculate bandwidth (bytes per second)
+        bandwidth = np.zeros(len(df), dtype=np.int64)
+        has_duration = flow_duration > 0
+        bandwidth[has_duration] = (total_bytes[has_duration] / (flow_duration[has_duration] / 1_000_000)).astype(np.int64)
+
+        # Calculate latency estimate from IAT (Inter-Arrival Time)
+        fwd_iat_mean = self.flow_column(df, 'Fwd IAT Mean', 0).to_numpy().astype(np.float64)
+        latency = fwd_iat_mean / 1000  # Convert microseconds to milliseconds
+
+        src_node_types = _interned(self.infer_node_types(src_ports).tolist())
+        dst_node_types = _interned(self.infer_node_types(dst_ports).tolist())
+        src_node_ids = [f"{ip}:{port}" for ip, port in zip(src_ips, src_ports.tolist())]
+        dst_node_ids = [f"{ip}:{port}" for ip, port in zip(dst_ips, dst_ports.tolist())]
+        now = datetime.now().isoformat()
+        # Geolocate in per-flow (source, destination) order: lookups draw random cities and coordinates
+        geo_by_ip = self.resolve_geo(chain.from_iterable(zip(src_ips, dst_ips)))
+
+        all_edges = [
+            {
+                "id": f"flow_{flow_id}",
+                "source_id": source_id,
+                "target_id": target_id,
+                "connection_type": connection_type,
+                "bandwidth": flow_bandwidth,
+                "latency": flow_latency,
+                "packet_count": packet_count,
+                "protocol": protocol,
+                "attack_type": attack_type,
+                "timestamp": now
+            }
+            for flow_id, source_id, target_id, connection_type, flow_bandwidth, flow_latency, packet_count, protocol, attack_type
+            in zip(df.index.tolist(), src_node_ids, dst_node_ids, _interned(connection_types.tolist()), bandwidth.tolist(),
+                   latency.tolist(), total_packets.tolist(), protocols, attack_types)
+        ]
+
+        # Deduplicate endpoints by ID: one row per flow endpoint, interleaved (src, dst) per flow
+        # so groups keep first-seen order; traffic is summed and the most severe status wins
+        endpoints = pd.DataFrame({
+            "id": np.stack([np.array(src_node_ids, dtype=object), np.array(dst_node_ids, dtype=object)], axis=1).ravel(),
+            "traffic_volume": np.stack([fwd_bytes, bwd_bytes], axis=1).ravel(),
+            "status": np.stack([src_statuses, dst_statuses], axis=1).ravel()
+        })
+        grouped = endpoints.groupby("id", sort=False)
+        first_rows = np.flatnonzero(~endpoints["id"].duplicated().to_numpy()).tolist()
+        traffic_volumes = grouped["traffic_volume"].sum().tolist()
+        statuses = grouped["status"].max().tolist()
+
+        # The first occurrence of each node supplies its remaining fields
+        node_ips = (src_ips, dst_ips)
+        node_ports = (src_ports.tolist(), dst_ports.tolist())
+        node_types = (src_node_types, dst_node_types)
+        node_ids = (src_node_ids, dst_node_ids)
+        nodes_list = []
+        for row, volume, status in zip(first_rows, traffic_volumes, statuses):
+            flow, side = divmod(row, 2)
+            ip = node_ips[side][flow]
+            geo = geo_by_ip[ip]
+            nodes_list.append({
+                "id": node_ids[side][flow],
+                "ip": ip,
+                "port": node_ports[side][flow],
+                "country": geo["country"],
+                "city": geo["city"],
+                "latitude": geo["latitude"],
+                "longitude": geo["longitude"],
+                "node_type": node_types[side][flow],
+                "status": NODE_STATUSES[status],
+                "traffic_volume": volume,
+                "last_seen": now
+            })
 
         # Calculate statistics
         total_traffic = sum(node["traffic_volume"] for node in nodes_list)
@@ -350,8 +394,9 @@ class CICDDoSPreprocessor:
         """Save processed data to JSON file"""
         output_path = self.processed_data_dir / f"{output_name}.json"
 
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Compact JSON: every reader of data/processed parses it, nobody reads it by eye
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(data))
 
         print(f"Saved processed data to {output_path}")
 
@@ -371,21 +416,44 @@ class CICDDoSPreprocessor:
 
         print(f"Found {len(data_files)} data files")
 
+        # Geolocation draws a random city and coordinates per IP, so resolve every file here,
+        # in file and flow order through this preprocessor's cache, before fanning out:
+        # an IP then gets the same geo in every processed file
+        file_geos = []
         for data_file in data_files:
-            # Load data file
-            df = self.load_data_file(data_file, nrows=max_flows_per_file)
-
-            if df.empty:
-                continue
-
-            # Process to network graph
-            processed_data = self.process_dataframe(df, max_flows=max_flows_per_file)
-
-            # Save processed data
-            output_name = data_file.stem  # Filename without extension
-            self.save_processed_data(processed_data, output_name)
-
-            print(f"✓ Completed {data_file.name}\n")
+            ip_df = self.load_data_file(data_file, nrows=max_flows_per_file, columns=self.IP_COLUMNS)
+            if max_flows_per_file:
+                ip_df = ip_df.head(max_flows_per_file)
+            ips = dict.fromkeys(chain.from_iterable(zip(*self.flow_ips(ip_df))))
+            geo_by_ip = self.resolve_geo(ips)
+            file_geos.append({ip: geo_by_ip[ip] for ip in ips})
+
+        # Files are otherwise independent, so preprocess them in parallel, one worker process per file at most
+        with ProcessPoolExecutor(max_workers=min(len(data_files), os.cpu_count() or 1)) as executor:
+            for data_file in executor.map(_process_data_file, data_files, file_geos,
+                                          repeat(str(self.raw_data_dir)), repeat(str(self.processed_data_dir)),
+                                          repeat(max_flows_per_file)):
+                print(f"✓ Completed {data_file.name}\n")
+
+
+def _process_data_file(data_file: Path, ip_geo: Dict[str, Dict], raw_data_dir: str, processed_data_dir: str,
+                       max_flows_per_file: int) -> Path:
+    """Load, process and save one raw data file with its IPs already geolocated; runs in a worker process"""
+    preprocessor = CICDDoSPreprocessor(raw_data_dir=raw_data_dir, processed_data_dir=processed_data_dir)
+    preprocessor.ip_geo_cache.update(ip_geo)
+
+    # Load data file
+    df = preprocessor.load_data_file(data_file, nrows=max_flows_per_file)
+
+    if not df.empty:
+        # Process to network graph
+        processed_data = preprocessor.process_dataframe(df, max_flows=max_flows_per_file)
+
+        # Save processed data
+        output_name = data_file.stem  # Filename without extension
+        preprocessor.save_processed_data(processed_data, output_name)
+
+    return data_file
 
 
 # CLI interface
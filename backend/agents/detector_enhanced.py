@@ -6,6 +6,7 @@ from typing import Dict, List, Any
 from agents.base import BaseAgent, AgentRole, AgentInput, AgentOutput, ThreatLevel
 from datetime import datetime
 import math
+import numpy as np
 
 
 class EnhancedDetectorAgent(BaseAgent):
@@ -142,13 +143,16 @@ class EnhancedDetectorAgent(BaseAgent):
         coordinated_detections = self._detect_coordinated_attacks(edges, nodes)
         detections.extend(coordinated_detections)
 
+        # Count severities and sum confidence in one pass over the detections
+        severity_counts, total_confidence = self._tally_detections(detections)
+
         # Update statistics
         self.detection_stats["total_flows_analyzed"] += len(edges)
-        self.detection_stats["attacks_detected"] += len([d for d in detections if d["severity"] in ["high", "critical"]])
-        self.detection_stats["suspicious_flagged"] += len([d for d in detections if d["severity"] == "medium"])
+        self.detection_stats["attacks_detected"] += severity_counts["high"] + severity_counts["critical"]
+        self.detection_stats["suspicious_flagged"] += severity_counts["medium"]
 
         # Calculate overall threat level
-        threat_level, confidence = self._calculate_threat_level(detections)
+        threat_level, confidence = self._calculate_threat_level(severity_counts, total_confidence, len(detections))
 
         # Generate decision
         decision_text = self._generate_decision_text(detections, threat_level)
@@ -184,9 +188,44 @@ class EnhancedDetectorAgent(BaseAgent):
         """Analyze individual edges for attack patterns"""
         detections = []
 
-        for edge in edges:
+        if not edges:
+            return detections
+
+        # Columnar view of the batch: one array per edge metric
+        count = len(edges)
+        labeled = np.fromiter((e.get("connection_type") == "attack" for e in edges), dtype=bool, count=count)
+        packet_counts = np.fromiter((e.get("packet_count", 0) for e in edges), dtype=np.float64, count=count)
+        bandwidths = np.fromiter((e.get("bandwidth", 0) for e in edges), dtype=np.float64, count=count)
+        protocols = np.fromiter(
+            (_SIG_PROTOCOL_CODES.get(e.get("protocol", "").upper(), -1) for e in edges),
+            dtype=np.int8, count=count
+        )
+
+        # Extract port from node IDs (format: "ip:port"); -1 when the target has none
+        target_ports = [
+            int(target_id.rsplit(":", 1)[1]) if ":" in target_id else None
+            for target_id in (e.get("target_id", "") for e in edges)
+        ]
+        ports = np.fromiter((-1 if port is None else port for port in target_ports), dtype=np.int64, count=count)
+
+        # Match every edge against every signature at once: port and protocol match and a threshold is exceeded
+        port_ok = (_SIG_PORTS == -1) | (ports[:, None] == _SIG_PORTS)
+        protocol_ok = (_SIG_PROTOCOLS == 0) | (protocols[:, None] == _SIG_PROTOCOLS)
+        over_threshold = (packet_counts[:, None] > _SIG_PACKET_THRESHOLDS) | (bandwidths[:, None] > _SIG_BANDWIDTH_THRESHOLDS)
+        matches = port_ok & protocol_ok & over_threshold
+
+        # Only flagged edges become detections: labeled attack first, then signatures, per edge in order
+        match_rows, match_cols = np.nonzero(matches)
+        labeled_rows = np.flatnonzero(labeled)
+        rows = np.concatenate([labeled_rows, match_rows])
+        cols = np.concatenate([np.full(len(labeled_rows), -1), match_cols])
+        order = np.lexsort((cols, rows))
+
+        for i, col in zip(rows[order].tolist(), cols[order].tolist()):
+            edge = edges[i]
+
             # Check if already labeled as attack from dataset
-            if edge.get("connection_type") == "attack":
+            if col < 0:
                 attack_type = edge.get("attack_type", "Unknown")
                 detections.append({
                     "type": "labeled_attack",
@@ -198,44 +237,21 @@ class EnhancedDetectorAgent(BaseAgent):
                     "target": edge.get("target_id"),
                     "evidence": f"Labeled as {attack_type} in dataset"
                 })
+                continue
 
-            # Analyze metrics for attack signatures
             packet_count = edge.get("packet_count", 0)
-            bandwidth = edge.get("bandwidth", 0)
-            protocol = edge.get("protocol", "").upper()
-
-            # Extract port from node IDs (format: "ip:port")
-            target_id = edge.get("target_id", "")
-            target_port = None
-            if ":" in target_id:
-                target_port = int(target_id.split(":")[-1])
-
-            # Check against attack signatures
-            for attack_name, signature in self.ATTACK_SIGNATURES.items():
-                sig_port = signature.get("port")
-                sig_protocol = signature.get("protocol")
-                packet_threshold = signature.get("packet_rate_threshold", float('inf'))
-                bandwidth_threshold = signature.get("bandwidth_threshold", float('inf'))
-
-                # Port and protocol matching
-                port_match = sig_port is None or (target_port == sig_port)
-                protocol_match = sig_protocol is None or (protocol == sig_protocol)
-
-                if port_match and protocol_match:
-                    # Check thresholds
-                    if packet_count > packet_threshold or bandwidth > bandwidth_threshold:
-                        confidence = min(0.99, 0.6 + (packet_count / packet_threshold) * 0.3)
-
-                        detections.append({
-                            "type": "signature_match",
-                            "attack_type": attack_name,
-                            "edge_id": edge.get("id"),
-                            "severity": "high",
-                            "confidence": confidence,
-                            "source": edge.get("source_id"),
-                            "target": edge.get("target_id"),
-                            "evidence": f"Packet rate: {packet_count}, Bandwidth: {bandwidth}, Port: {target_port}"
-                        })
+            confidence = min(0.99, 0.6 + (packet_count / _SIG_PACKET_THRESHOLDS[col].item()) * 0.3)
+
+            detections.append({
+                "type": "signature_match",
+                "attack_type": _SIG_NAMES[col],
+                "edge_id": edge.get("id"),
+                "severity": "high",
+                "confidence": confidence,
+                "source": edge.get("source_id"),
+                "target": edge.get("target_id"),
+                "evidence": f"Packet rate: {packet_count}, Bandwidth: {edge.get('bandwidth', 0)}, Port: {target_ports[i]}"
+            })
 
         return detections
 
@@ -247,19 +263,24 @@ class EnhancedDetectorAgent(BaseAgent):
             return detections
 
         # Calculate traffic volume statistics
-        traffic_volumes = [n.get("traffic_volume", 0) for n in nodes]
-        avg_traffic = sum(traffic_volumes) / len(traffic_volumes) if traffic_volumes else 0
-        max_traffic = max(traffic_volumes) if traffic_volumes else 0
+        traffic_volumes = np.array([n.get("traffic_volume", 0) for n in nodes])
+        avg_traffic = traffic_volumes.sum().item() / len(nodes)
 
         # Heavy-hitter threshold: 5x average or >100MB
         heavy_hitter_threshold = max(avg_traffic * 5, 100_000_000)
+        heavy_hitters = traffic_volumes > heavy_hitter_threshold
+        anomalous = np.fromiter(
+            (n.get("status", "normal") in ("attacked", "suspicious") for n in nodes),
+            dtype=bool, count=len(nodes)
+        )
 
-        for node in nodes:
-            traffic_vol = node.get("traffic_volume", 0)
-            status = node.get("status", "normal")
+        # Only flagged nodes become detections
+        for i in np.flatnonzero(heavy_hitters | anomalous).tolist():
+            node = nodes[i]
 
             # Detect heavy-hitters
-            if traffic_vol > heavy_hitter_threshold:
+            if heavy_hitters[i]:
+                traffic_vol = node.get("traffic_volume", 0)
                 severity = "critical" if traffic_vol > heavy_hitter_threshold * 2 else "high"
                 confidence = min(0.95, 0.7 + (traffic_vol / (heavy_hitter_threshold * 2)) * 0.25)
 
@@ -273,7 +294,8 @@ class EnhancedDetectorAgent(BaseAgent):
                 })
 
             # Check node status
-            if status in ["attacked", "suspicious"]:
+            if anomalous[i]:
+                status = node.get("status", "normal")
                 detections.append({
                     "type": "node_status_anomaly",
                     "node_id": node.get("id"),
@@ -358,21 +380,24 @@ class EnhancedDetectorAgent(BaseAgent):
 
         return detections
 
-    def _calculate_threat_level(self, detections: List[Dict]) -> tuple:
-        """Calculate overall threat level and confidence"""
-        if not detections:
-            return "low", 0.5
-
-        # Count severities
+    def _tally_detections(self, detections: List[Dict]) -> tuple:
+        """Severity counts and summed confidence of a list of detections"""
         severity_counts = {"critical": 0, "high": 0, "medium": 0, "low": 0}
         total_confidence = 0
 
         for detection in detections:
-            severity = detection.get("severity", "low")
-            severity_counts[severity] += 1
+            severity_counts[detection.get("severity", "low")] += 1
             total_confidence += detection.get("confidence", 0.5)
 
-        avg_confidence = total_confidence / len(detections)
+        return severity_counts, total_confidence
+
+    def _calculate_threat_level(self, severity_counts: Dict[str, int], total_confidence: float,
+                                detection_count: int) -> tuple:
+        """Calculate overall threat level and confidence from tallied detections"""
+        if not detection_count:
+            return "low", 0.5
+
+        avg_confidence = total_confidence / detection_count
 
         # Determine threat level
         if severity_counts["critical"] > 0:
@@ -457,5 +482,30 @@ class EnhancedDetectorAgent(BaseAgent):
         return "\n".join(reasoning_parts)
 
 
+# EnhancedDetectorAgent.ATTACK_SIGNATURES as aligned arrays, for matching a whole batch of edges at once.
+# A port of -1 and a protocol code of 0 mean "any".
+_SIG_NAMES = tuple(EnhancedDetectorAgent.ATTACK_SIGNATURES)
+_SIG_PROTOCOL_CODES = {
+    protocol: code for code, protocol in enumerate(
+        dict.fromkeys(sig["protocol"] for sig in EnhancedDetectorAgent.ATTACK_SIGNATURES.values() if sig.get("protocol")),
+        start=1
+    )
+}
+_SIG_PORTS = np.array(
+    [sig.get("port") or -1 for sig in EnhancedDetectorAgent.ATTACK_SIGNATURES.values()], dtype=np.int64
+)
+_SIG_PROTOCOLS = np.array(
+    [_SIG_PROTOCOL_CODES.get(sig.get("protocol"), 0) for sig in EnhancedDetectorAgent.ATTACK_SIGNATURES.values()],
+    dtype=np.int8
+)
+_SIG_PACKET_THRESHOLDS = np.array(
+    [sig.get("packet_rate_threshold", float('inf')) for sig in EnhancedDetectorAgent.ATTACK_SIGNATURES.values()],
+    dtype=np.float64
+)
+_SIG_BANDWIDTH_THRESHOLDS = np.array(
+    [sig.get("bandwidth_threshold", float('inf')) for sig in EnhancedDetectorAgent.ATTACK_SIGNATURES.values()],
+    dtype=np.float64
+)
+
 # Singleton instance
 enhanced_detector = EnhancedDetectorAgent()
@@ -4,14 +4,100 @@ Streams events from CIC dataset with real-time timestamps and pagination
 """
 
 import asyncio
-import json
 import random
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, AsyncGenerator
+from typing import List, Dict, Optional, AsyncGenerator, Deque
 from dataclasses import dataclass
 import os
 
-@dataclass
+from agents.batch_processor import load_dataset as load_cached_dataset
+
+# Threads used to parse the event source files
+EVENT_FILE_WORKERS = 8
+
+# Streamed events kept for pagination
+STREAMED_EVENTS_LIMIT = 1000
+
+# Country name -> ISO code for event badges; unknown countries get 'XX'
+COUNTRY_CODES = {
+    'United States': 'US', 'China': 'CN', 'Russia': 'RU',
+    'Germany': 'DE', 'United Kingdom': 'GB', 'France': 'FR',
+    'Japan': 'JP', 'South Korea': 'KR', 'India': 'IN',
+    'Brazil': 'BR', 'Canada': 'CA', 'Australia': 'AU',
+    'Netherlands': 'NL', 'Singapore': 'SG', 'Israel': 'IL',
+    'Ukraine': 'UA', 'Italy': 'IT', 'Spain': 'ES',
+    'Mexico': 'MX', 'Argentina': 'AR', 'South Africa': 'ZA'
+}
+
+# Event content by severity; ALERT reasons name the attack and come from _alert_reasons
+EVENT_REASONS = {
+    "OK": (
+        "Normal traffic pattern detected",
+        "Regular network activity",
+        "Standard communication flow",
+        "Baseline traffic observed"
+    ),
+    "WARN": (
+        "Unusual traffic pattern detected",
+        "Traffic volume spike observed",
+        "Suspicious network behavior",
+        "Anomalous connection pattern"
+    )
+}
+
+EVENT_CHANGES = {
+    "OK": (
+        "No significant changes",
+        "Traffic within normal parameters",
+        "Standard operational status"
+    ),
+    "WARN": (
+        "Traffic volume increased by 150%",
+        "Unusual connection frequency",
+        "Network behavior deviation detected"
+    ),
+    "ALERT": (
+        "Critical security event",
+        "Unauthorized access attempt",
+        "Suspicious data exfiltration"
+    )
+}
+
+EVENT_NEXT_STEPS = {
+    "OK": (
+        "Continue monitoring",
+        "Maintain current security posture",
+        "No action required"
+    ),
+    "WARN": (
+        "Investigate further",
+        "Monitor closely",
+        "Review security logs"
+    ),
+    "ALERT": (
+        "Immediate response required",
+        "Activate incident response",
+        "Block suspicious IPs"
+    )
+}
+
+
+@lru_cache(maxsize=None)
+def _alert_reasons(source_file: str) -> tuple:
+    """ALERT reasons for events from one source file, built once per file"""
+    attack_type = source_file.replace('.json', '').replace('DrDoS_', '')
+    return (
+        f"Potential {attack_type} attack detected",
+        "Critical security breach detected",
+        "APT infiltration attempt",
+        "Malicious activity identified"
+    )
+
+@dataclass(slots=True, frozen=True)
 class StreamedEvent:
     """Real-time event with streaming timestamp"""
     incident_id: str
@@ -32,13 +118,19 @@ class EventStreamer:
     def __init__(self):
         self.data_dir = "data/processed"
         self.events_pool: List[Dict] = []
-        self.streamed_events: List[StreamedEvent] = []
+        self.events_by_severity: Dict[str, List[Dict]] = {}
+        # Newest on the right; streamed_at only grows, so the buffers stay in time order
+        self.streamed_events: Deque[StreamedEvent] = deque(maxlen=STREAMED_EVENTS_LIMIT)
+        self.streamed_by_severity: Dict[str, Deque[StreamedEvent]] = {
+            severity: deque() for severity in ("ALERT", "WARN", "OK")
+        }
         self.current_scenario = "mixed"
         self.load_events_pool()
     
     def load_events_pool(self):
         """Load all events from JSON files into a pool for streaming"""
         self.events_pool = []
+        self.events_by_severity = {}
         
         # Load events from all JSON files
         json_files = [
@@ -49,24 +141,38 @@ class EventStreamer:
             "UDP.json", "UDPLag.json"
         ]
         
-        for json_file in json_files:
-            file_path = os.path.join(self.data_dir, json_file)
-            if os.path.exists(file_path):
-                try:
-                    with open(file_path, 'r') as f:
-                        data = json.load(f)
-                    
-                    # Extract nodes and create events
-                    for node in data.get('nodes', []):
-                        event = self._create_event_from_node(node, json_file)
-                        if event:
-                            self.events_pool.append(event)
-                            
-                except Exception as e:
-                    print(f"Error loading {json_file}: {e}")
+        # Read and parse the files concurrently; events are still built in file order
+        present_files = [f for f in json_files if os.path.exists(os.path.join(self.data_dir, f))]
+        if present_files:
+            with ThreadPoolExecutor(max_workers=min(EVENT_FILE_WORKERS, len(present_files))) as executor:
+                datasets = list(executor.map(self._read_event_file, present_files))
+        else:
+            datasets = []
+        
+        for json_file, data in zip(present_files, datasets):
+            if data is None:
+                continue
+            try:
+                # Extract nodes and create events
+                for node in data.get('nodes', []):
+                    event = self._create_event_from_node(node, json_file)
+                    if event:
+                        self.events_pool.append(event)
+                        self.events_by_severity.setdefault(event['severity'], []).append(event)
+                        
+            except Exception as e:
+                print(f"Error loading {json_file}: {e}")
         
         print(f"Loaded {len(self.events_pool)} events into streaming pool")
     
+    def _read_event_file(self, json_file: str) -> Optional[Dict]:
+        """Parse one processed dataset, sharing the batch processor's (path, mtime) cache"""
+        try:
+            return load_cached_dataset(os.path.join(self.data_dir, json_file))
+        except Exception as e:
+            print(f"Error loading {json_file}: {e}")
+            return None
+    
     def _create_event_from_node(self, node: Dict, source_file: str) -> Optional[Dict]:
         """Create an event from a node in the JSON data"""
         try:
@@ -82,11 +188,12 @@ class EventStreamer:
             # Generate appropriate content based on severity and source file
             reason, change, next_step = self._generate_event_content(severity, source_file)
             
+            country = node.get('country', 'Unknown')
             return {
                 'incident_id': f"INC-{source_file.replace('.json', '').upper()}-{random.randint(1000, 9999)}",
                 'severity': severity,
-                'country': node.get('country', 'Unknown'),
-                'country_code': self._get_country_code(node.get('country', 'Unknown')),
+                'country': country,
+                'country_code': COUNTRY_CODES.get(country, 'XX'),
                 'ip': node.get('ip', '0.0.0.0'),
                 'reason': reason,
                 'change': change,
@@ -100,98 +207,25 @@ class EventStreamer:
     
     def _generate_event_content(self, severity: str, source_file: str) -> tuple:
         """Generate appropriate event content based on severity and source"""
-        if severity == "OK":
-            reasons = [
-                "Normal traffic pattern detected",
-                "Regular network activity",
-                "Standard communication flow",
-                "Baseline traffic observed"
-            ]
-            changes = [
-                "No significant changes",
-                "Traffic within normal parameters",
-                "Standard operational status"
-            ]
-            next_steps = [
-                "Continue monitoring",
-                "Maintain current security posture",
-                "No action required"
-            ]
-        elif severity == "WARN":
-            reasons = [
-                "Unusual traffic pattern detected",
-                "Traffic volume spike observed",
-                "Suspicious network behavior",
-                "Anomalous connection pattern"
-            ]
-            changes = [
-                "Traffic volume increased by 150%",
-                "Unusual connection frequency",
-                "Network behavior deviation detected"
-            ]
-            next_steps = [
-                "Investigate further",
-                "Monitor closely",
-                "Review security logs"
-            ]
-        else:  # ALERT
-            attack_type = source_file.replace('.json', '').replace('DrDoS_', '')
-            reasons = [
-                f"Potential {attack_type} attack detected",
-                "Critical security breach detected",
-                "APT infiltration attempt",
-                "Malicious activity identified"
-            ]
-            changes = [
-                "Critical security event",
-                "Unauthorized access attempt",
-                "Suspicious data exfiltration"
-            ]
-            next_steps = [
-                "Immediate response required",
-                "Activate incident response",
-                "Block suspicious IPs"
-            ]
-        
+        reasons = _alert_reasons(source_file) if severity == "ALERT" else EVENT_REASONS[severity]
         return (
             random.choice(reasons),
-            random.choice(changes),
-            random.choice(next_steps)
+            random.choice(EVENT_CHANGES[severity]),
+            random.choice(EVENT_NEXT_STEPS[severity])
         )
     
-    def _get_country_code(self, country_name: str) -> str:
-        """Get country code from country name"""
-        country_codes = {
-            'United States': 'US', 'China': 'CN', 'Russia': 'RU',
-            'Germany': 'DE', 'United Kingdom': 'GB', 'France': 'FR',
-            'Japan': 'JP', 'South Korea': 'KR', 'India': 'IN',
-            'Brazil': 'BR', 'Canada': 'CA', 'Australia': 'AU',
-            'Netherlands': 'NL', 'Singapore': 'SG', 'Israel': 'IL',
-            'Ukraine': 'UA', 'Italy': 'IT', 'Spain': 'ES',
-            'Mexico': 'MX', 'Argentina': 'AR', 'South Africa': 'ZA'
-        }
-        return country_codes.get(country_name, 'XX')
-    
     def set_scenario(self, scenario: str):
         """Set the current scenario (affects event distribution)"""
         self.current_scenario = scenario
     
-    async def stream_single_event(self, severity_filter: Optional[str] = None) -> Optional[StreamedEvent]:
-        """Stream a single event with real-time timestamp"""
-        # Filter events based on severity if specified
-        available_events = self.events_pool.copy()
+    def _event_pool(self, severity_filter: Optional[str] = None) -> List[Dict]:
+        """Pool for the requested severity; severities are fixed when the pool is loaded"""
         if severity_filter and severity_filter != 'all':
-            available_events = [e for e in available_events if e['severity'] == severity_filter]
-        
-        if not available_events:
-            return None
-        
-        # Randomly select one event to stream
-        event_data = random.choice(available_events)
-        
-        # Create streamed event with current timestamp
-        stream_time = datetime.now()
-        
+            return self.events_by_severity.get(severity_filter, [])
+        return self.events_pool
+    
+    def _to_streamed(self, event_data: Dict, streamed_at: str) -> StreamedEvent:
+        """Stamp a pool event with its streaming time and buffer it"""
         streamed_event = StreamedEvent(
             incident_id=event_data['incident_id'],
             severity=event_data['severity'],
@@ -202,37 +236,63 @@ class EventStreamer:
             change=event_data['change'],
             status=event_data['status'],
             next_step=event_data['next_step'],
-            streamed_at=stream_time.isoformat() + 'Z',
+            streamed_at=streamed_at,
             original_data=event_data['original_data']
         )
+        self._record_streamed(streamed_event)
+        return streamed_event
+    
+    async def stream_single_event(self, severity_filter: Optional[str] = None) -> Optional[StreamedEvent]:
+        """Stream a single event with real-time timestamp"""
+        available_events = self._event_pool(severity_filter)
         
-        # Add to streamed events list
-        self.streamed_events.append(streamed_event)
+        if not available_events:
+            return None
         
-        # Keep only last 1000 streamed events to prevent memory issues
-        if len(self.streamed_events) > 1000:
-            self.streamed_events = self.streamed_events[-1000:]
+        # Randomly select one event to stream
+        event_data = random.choice(available_events)
         
-        return streamed_event
+        # Create streamed event with current timestamp
+        return self._to_streamed(event_data, datetime.now().isoformat() + 'Z')
     
-    def get_streamed_events(self, limit: int = 10, offset: int = 0, severity_filter: Optional[str] = None) -> List[StreamedEvent]:
-        """Get paginated streamed events"""
-        filtered_events = self.streamed_events.copy()
+    async def stream_batch(self, n: int, severity_filter: Optional[str] = None) -> AsyncGenerator[StreamedEvent, None]:
+        """
+        Stream n events drawn in one random.choices call
         
-        # Apply severity filter
-        if severity_filter and severity_filter != 'all':
-            filtered_events = [e for e in filtered_events if e.severity == severity_filter]
+        Events share one clock reading and are spaced a microsecond apart so
+        they keep their order in the streamed buffers.
+        """
+        available_events = self._event_pool(severity_filter)
+        
+        if not available_events or n <= 0:
+            return
         
-        # Sort by streamed_at (newest first)
-        filtered_events.sort(key=lambda x: x.streamed_at, reverse=True)
+        stream_time = datetime.now()
+        for i, event_data in enumerate(random.choices(available_events, k=n)):
+            yield self._to_streamed(event_data, (stream_time + timedelta(microseconds=i)).isoformat() + 'Z')
+    
+    def _record_streamed(self, streamed_event: StreamedEvent):
+        """Buffer a streamed event, keeping only the last STREAMED_EVENTS_LIMIT across all severities"""
+        if len(self.streamed_events) == self.streamed_events.maxlen:
+            # The oldest event is about to fall out; it is also the oldest of its severity
+            self.streamed_by_severity[self.streamed_events[0].severity].popleft()
+        self.streamed_events.append(streamed_event)
+        self.streamed_by_severity.setdefault(streamed_event.severity, deque()).append(streamed_event)
+    
+    def get_streamed_events(self, limit: int = 10, offset: int = 0, severity_filter: Optional[str] = None) -> List[StreamedEvent]:
+        """Get paginated streamed events, newest first"""
+        if severity_filter and severity_filter != 'all':
+            events = self.streamed_by_severity.get(severity_filter, ())
+        else:
+            events = self.streamed_events
         
-        # Apply pagination
-        return filtered_events[offset:offset + limit]
+        # Walk back from the newest event; nothing outside the page is touched
+        return list(islice(reversed(events), offset, offset + limit))
     
     def get_total_count(self, severity_filter: Optional[str] = None) -> int:
         """Get total count of streamed events"""
         if severity_filter and severity_filter != 'all':
-            return len([e for e in self.streamed_events if e.severity == severity_filter])
+            return len(self.streamed_by_severity.get(severity_filter, ()))
         return len(self.streamed_events)
 
 # Global instance
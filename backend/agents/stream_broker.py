@@ -0,0 +1,97 @@
+"""
+Fan-out broker for agent workflow SSE streams and country batch streams
+Runs each producer once and shares its encoded frames with every subscriber
+"""
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+# Frames buffered per subscriber before the oldest ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class StreamBroker:
+    """Runs one producer per run id and fans its frames out to subscriber queues"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.queue_size = queue_size
+        self.dropped_frames = 0
+
+    def subscribe(self, run_id: str, producer: Callable[[], AsyncIterator[bytes]]) -> asyncio.Queue:
+        """
+        Attach a new subscriber queue to `run_id`, starting the producer if the run is not live yet.
+        Late subscribers receive the frames already published for the run before any new ones.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        run = self.runs.get(run_id)
+
+        if run is None:
+            # Create the producer first so a failing factory leaves no dead run behind
+            frames = producer()
+            run = {"subscribers": [queue], "history": deque(maxlen=self.queue_size), "task": None}
+            self.runs[run_id] = run
+            run["task"] = asyncio.create_task(self._publish(run_id, run, frames))
+        else:
+            for frame in run["history"]:
+                self._offer(queue, frame)
+            run["subscribers"].append(queue)
+
+        return queue
+
+    def unsubscribe(self, run_id: str, queue: asyncio.Queue):
+        """Detach a subscriber; the producer is cancelled once nobody is listening"""
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        if queue in run["subscribers"]:
+            run["subscribers"].remove(queue)
+        if not run["subscribers"]:
+            run["task"].cancel()
+            self.runs.pop(run_id, None)
+
+    async def stream(self, run_id: str, producer: Callable[[], AsyncIterator[bytes]]):
+        """Yield the frames of `run_id` for a single subscriber until the run completes"""
+        queue = self.subscribe(run_id, producer)
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(run_id, queue)
+
+    async def _publish(self, run_id: str, run: Dict[str, Any], frames: AsyncIterator[bytes]):
+        """Drain the producer once, handing the same frame object to every subscriber"""
+        try:
+            async for frame in frames:
+                run["history"].append(frame)
+                for queue in run["subscribers"]:
+                    self._offer(queue, frame)
+        finally:
+            for queue in run["subscribers"]:
+                self._offer(queue, None)
+            if self.runs.get(run_id) is run:
+                del self.runs[run_id]
+
+    def _offer(self, queue: asyncio.Queue, frame: Optional[bytes]):
+        """Enqueue without blocking the producer; a slow subscriber loses its oldest frame instead"""
+        try:
+            queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait(frame)
+            self.dropped_frames += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        """Live runs, subscriber counts and frames dropped for slow subscribers"""
+        return {
+            "active_runs": len(self.runs),
+            "subscribers": sum(len(run["subscribers"]) for run in self.runs.values()),
+            "dropped_frames": self.dropped_frames
+        }
+
+
+# Global broker for agent workflow streams
+agent_stream_broker = StreamBroker()
@@ -1864,7 +1864,7 @@ Execute appropriate mitigation actions and return detailed results.""")
 
         return {
             "agent": display_names.get(agent_name, agent_name.title()),
-            "timestamp": decision.timestamp or datetime.now().isoformat(),
+            "timestamp": decision.timestamp,
             "action": actions.get(agent_name, "Processing"),
             "summary": decision.reasoning,
             "confidence": decision.confidence,
@@ -1947,7 +1947,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             decision = state["orchestrator_decision"]
             interactions.append({
                 "agent": "Orchestrator",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Network traffic analysis and routing",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -1969,7 +1969,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             threats_count = len(decision.metadata.get("threats_detected", []))
             interactions.append({
                 "agent": "Detector",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Threat detection and analysis",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -1992,7 +1992,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             investigations_count = len(decision.metadata.get("investigations", []))
             interactions.append({
                 "agent": "Investigator",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Deep forensic investigation",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -2014,7 +2014,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             decision = state["monitor_decision"]
             interactions.append({
                 "agent": "Monitor",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Network health monitoring",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -2035,7 +2035,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             decision = state["judge_decision"]
             interactions.append({
                 "agent": "Judge",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Final security decision",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -2058,7 +2058,7 @@ Execute appropriate mitigation actions and return detailed results.""")
             actions_count = len(decision.metadata.get("mitigation_actions", []))
             interactions.append({
                 "agent": "Mitigator",
-                "timestamp": decision.timestamp or datetime.now().isoformat(),
+                "timestamp": decision.timestamp,
                 "action": "Mitigation actions execution",
                 "summary": decision.reasoning,
                 "confidence": decision.confidence,
@@ -3,13 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from agents.api import router as agents_router
 from agents.network_api import router as network_router
 from agents.network_stream import network_streamer
-from agents.cic_replayer import app as cic_replayer_app
+from agents.cic_replayer import app as cic_replayer_app, lifespan as cic_replayer_lifespan
 from api.mitigation import router as mitigation_router
 
 app = FastAPI(
     title="A10Hacks AI Agent System",
     description="AI-powered cybersecurity agent system with conflict resolution",
-    version="1.0.0"
+    version="1.0.0",
+    # Mounted apps don't get lifespan events, so the replayer is warmed up from here
+    lifespan=cic_replayer_lifespan
 )
 
 # Configure CORS
@@ -62,5 +64,6 @@ async def websocket_network_stream(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Batch messages repeat the same JSON keys, so keep permessage-deflate on for WebSockets
+    uvicorn.run(app, host="0.0.0.0", port=8000, ws_per_message_deflate=True)
 